@@ -0,0 +1,124 @@
+# async_store.py
+import asyncio
+import weakref
+import products
+import store
+from money import Money
+from typing import Awaitable, Callable, List, Optional, Tuple, Any
+
+class StoreBusyError(Exception):
+    """Raised when an AsyncStore already has max_waiting orders queued."""
+
+class AsyncStore:
+    """
+    asyncio front-end for a store.Store.
+
+    Orders take one asyncio.Lock per product (in id() order, like the
+    thread-safe Store) so an order that awaits before committing, e.g. for
+    a payment check, keeps other orders off its products in the meantime.
+    A semaphore caps how many orders run at once; the rest wait, and with
+    max_waiting set, new orders are rejected once the queue is full.
+
+    Orders are committed by the synchronous Store.order, which waits for
+    the store's write-ahead log when one is attached: with a log, every
+    order blocks the event loop for its group's fsync. Where that latency
+    matters, run Store.order in an executor (loop.run_in_executor) instead.
+    """
+    def __init__(self, store_instance: store.Store, max_concurrent_orders: int = 100,
+                 max_waiting: Optional[int] = None):
+        """Wraps an existing store."""
+        if not isinstance(store_instance, store.Store):
+            raise TypeError("AsyncStore needs a store.Store instance.")
+        if max_concurrent_orders <= 0:
+            raise ValueError("max_concurrent_orders must be positive.")
+        self.store = store_instance
+        self.max_concurrent_orders = max_concurrent_orders
+        self.max_waiting = max_waiting
+        self._slots = asyncio.Semaphore(max_concurrent_orders)
+        # product -> asyncio.Lock, created on first use and dropped with the product
+        self._locks: 'weakref.WeakKeyDictionary[products.Product, asyncio.Lock]' = weakref.WeakKeyDictionary()
+        self._running = 0
+        self._waiting = 0
+
+    # --- Backpressure ---
+    @property
+    def running(self) -> int:
+        """Gets the number of orders currently being processed."""
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        """Gets the number of orders queued for a free slot."""
+        return self._waiting
+
+    # --- Delegated read/write API ---
+    def add_product(self, product: products.Product):
+        """Adds a product to the wrapped store."""
+        self.store.add_product(product)
+
+    def remove_product(self, product: products.Product):
+        """Removes a product from the wrapped store."""
+        self.store.remove_product(product)
+
+    def get_total_quantity(self) -> int:
+        """Returns the total quantity of the wrapped store."""
+        return self.store.get_total_quantity()
+
+    def get_all_products(self):
+        """Returns the active products of the wrapped store."""
+        return self.store.get_all_products()
+
+    def __contains__(self, product: products.Product) -> bool:
+        """Checks if a product exists in the wrapped store."""
+        return product in self.store
+
+    # --- Ordering ---
+    async def order(self, shopping_list: List[Tuple[products.Product, int]],
+                    before_commit: Optional[Callable[[List[Tuple[products.Product, int]]], Awaitable[Any]]] = None) -> Money:
+        """
+        Processes an order without blocking the event loop.
+
+        before_commit, if given, is awaited after stock was checked and
+        while the order's product locks are held; raising from it cancels
+        the order without touching stock.
+        """
+        if self.max_waiting is not None and self._slots.locked() and self._waiting >= self.max_waiting:
+            raise StoreBusyError(f"Too many pending orders ({self._waiting} waiting).")
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._running += 1
+        try:
+            demand = self.store._validate_order(shopping_list)
+            locks = [self._locks.setdefault(demand[key][0], asyncio.Lock()) for key in sorted(demand)]
+            acquired = []
+            try:
+                for lock in locks:
+                    await lock.acquire()
+                    acquired.append(lock)
+                if before_commit is not None:
+                    self.store._check_demand(demand)
+                    await before_commit(shopping_list)
+                # Store.order is synchronous, so nothing else runs on this loop until it returns,
+                # including the fsync it waits for when the store has a log
+                return self.store.order(shopping_list)
+            finally:
+                for lock in reversed(acquired):
+                    lock.release()
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    async def order_many(self, shopping_lists: List[List[Tuple[products.Product, int]]]) -> List[Any]:
+        """
+        Processes many orders concurrently.
+
+        Returns one entry per order, in order: the total price, or the
+        exception that order raised.
+        """
+        return await asyncio.gather(*(self.order(shopping_list) for shopping_list in shopping_lists),
+                                    return_exceptions=True)
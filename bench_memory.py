@@ -0,0 +1,49 @@
+# bench_memory.py
+"""
+Memory benchmark: bytes per product for the slotted product classes
+compared with the previous __dict__-based layout.
+
+Usage: python bench_memory.py [count]   (default: 1,000,000 instances)
+"""
+import gc
+import sys
+import threading
+import tracemalloc
+import products
+
+class DictProduct:
+    """The pre-__slots__ Product layout: a __dict__, an eager lock and a store list."""
+    def __init__(self, name: str, price: float, quantity: int):
+        self._stores = []
+        self._lock = threading.RLock()
+        self.name = name
+        self._price = price
+        self._quantity = quantity
+        self._active = quantity > 0
+        self._promotion = None
+
+def measure(factory, count: int) -> float:
+    """Returns the bytes allocated per instance when creating count instances."""
+    # Names are built up front so both layouts share the same strings
+    names = [f"Product {i}" for i in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [factory(names[i], 10, 5) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the instances is not part of the per-product cost
+    list_size = sys.getsizeof(instances)
+    del instances
+    return (after - before - list_size) / count
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Bytes per product, {count:,} instances")
+    for label, factory in [("dict-based (before)", DictProduct),
+                           ("Product (slots)", products.Product),
+                           ("LimitedProduct (slots)", lambda name, price, quantity: products.LimitedProduct(name, price, quantity, 1))]:
+        print(f"  {label:<24} {measure(factory, count):8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# bench_money.py
+"""
+Benchmark: integer-cents pricing (money.Money / cents columns) against the
+previous float arithmetic, for speed and exactness.
+
+The order path section times the real Product.buy and Store.order on a
+catalog of the current tree. Given --float-rev, it also runs the same
+section on products.py, promotions.py and store.py as of that git revision
+(e.g. the last one pricing in floats), so the Money path can be compared
+with the float one it replaced.
+
+Usage: python bench_money.py [pairs] [--float-rev REV]   (default: 200,000 price/quantity pairs)
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+import promotions
+from money import Money
+
+# The modules the order path runs through, exported from --float-rev
+ORDER_PATH_MODULES = ("products.py", "promotions.py", "store.py")
+
+def float_second_half(price: float, quantity: int) -> float:
+    """The previous SecondHalfPrice formula on floats."""
+    return ((quantity + 1) // 2) * price + (quantity // 2) * price * 0.5
+
+def float_percent(price: float, quantity: int, percent: float) -> float:
+    """The previous PercentDiscount formula on floats."""
+    return price * quantity * (1 - (percent / 100))
+
+def timed(function) -> float:
+    """Returns the best of three wall-clock timings of function(), in seconds."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def order_path(orders: int = 20_000, bulk_lines: int = 10_000) -> str:
+    """Times Product.buy and Store.order (5-line and bulk orders) on whichever modules are importable."""
+    import products
+    import store
+    rng = random.Random(42)
+    catalog = [products.Product(f"Product {index}", price=rng.randrange(100, 200_000) / 100, quantity=10**12)
+               for index in range(1000)]
+    thirty_off = promotions.PercentDiscount("30% off!", percent=30)
+    for product in catalog[::3]:
+        product.promotion = thirty_off
+    best_buy = store.Store(catalog)
+    baskets = [[(rng.choice(catalog), rng.randrange(1, 5)) for _ in range(5)] for _ in range(orders)]
+    bulk = [[(rng.choice(catalog), rng.randrange(1, 5)) for _ in range(bulk_lines)] for _ in range(5)]
+    lines = [line for basket in baskets for line in basket]
+    buy_time = timed(lambda: [product.buy(quantity) for product, quantity in lines]) / len(lines)
+    basket_time = timed(lambda: [best_buy.order(basket) for basket in baskets]) / len(baskets)
+    bulk_time = timed(lambda: [best_buy.order(order) for order in bulk]) / len(bulk)
+    return (f"buy {buy_time * 1e6:6.2f} us   5-line order {basket_time * 1e6:6.2f} us"
+            f"   {bulk_lines:,}-line order {bulk_time * 1e3:6.2f} ms")
+
+def float_order_path(revision: str) -> str:
+    """Runs order_path() on the order path modules as of a git revision, in a subprocess."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tree:
+        for name in ORDER_PATH_MODULES:
+            source = subprocess.run(["git", "show", f"{revision}:{name}"], cwd=here, check=True,
+                                    capture_output=True, text=True).stdout
+            with open(os.path.join(tree, name), "w", encoding="utf-8") as module_file:
+                module_file.write(source)
+        # The exported modules shadow the current ones; this file and money.py still come from here
+        environment = dict(os.environ, PYTHONPATH=os.pathsep.join([tree, here]))
+        return subprocess.run([sys.executable, "-c", "import bench_money; print(bench_money.order_path())"],
+                              env=environment, check=True, capture_output=True, text=True).stdout.strip()
+
+def main():
+    arguments = sys.argv[1:]
+    float_revision = None
+    if "--float-rev" in arguments:
+        index = arguments.index("--float-rev")
+        float_revision = arguments[index + 1]
+        del arguments[index:index + 2]
+    pairs = int(arguments[0]) if arguments else 200_000
+    rng = random.Random(42)
+    cents = [rng.randrange(1, 200_000) for _ in range(pairs)]
+    quantities = [rng.randrange(1, 10) for _ in range(pairs)]
+    float_prices = [price / 100 for price in cents]
+    half_price = promotions.SecondHalfPrice("Second Half price!")
+    thirty_off = promotions.PercentDiscount("30% off!", percent=30)
+
+    print(f"{pairs:,} (price, quantity) pairs, best of 3")
+
+    # Order totals: Store.order adds up int cents and makes one Money of the total;
+    # summing Money objects is shown for comparison, it is not what the order path does
+    float_lines = [float_percent(price, quantity, 30) for price, quantity in zip(float_prices, quantities)]
+    money_lines = [Money(price * quantity).scale(7, 10) for price, quantity in zip(cents, quantities)]
+    cent_lines = [line.cents for line in money_lines]
+    float_time = timed(lambda: sum(float_lines, 0.0))
+    cents_time = timed(lambda: sum(cent_lines))
+    money_time = timed(lambda: sum(money_lines, Money(0)))
+    print(f"  order sum          float {float_time * 1e3:8.2f} ms   integer cents {cents_time * 1e3:8.2f} ms"
+          f"   (Money objects {money_time * 1e3:8.2f} ms)")
+
+    # Bulk repricing: the batch promotion API on cents columns vs floats
+    cents_column, quantity_column = array('q', cents), array('q', quantities)
+    float_time = timed(lambda: [float_second_half(price, quantity) for price, quantity in zip(float_prices, quantities)])
+    money_time = timed(lambda: half_price.apply_promotion_batch(cents_column, quantity_column))
+    print(f"  second half batch  float {float_time * 1e3:8.2f} ms   integer cents {money_time * 1e3:8.2f} ms")
+    float_time = timed(lambda: [float_percent(price, quantity, 30) for price, quantity in zip(float_prices, quantities)])
+    money_time = timed(lambda: thirty_off.apply_promotion_batch(cents_column, quantity_column))
+    print(f"  30% off batch      float {float_time * 1e3:8.2f} ms   integer cents {money_time * 1e3:8.2f} ms")
+
+    # Exactness: even after rounding every float line to cents, the float sum is not exact
+    exact_cents = sum(cent_lines)
+    float_total = sum((round(line, 2) for line in float_lines), 0.0)
+    mismatched = sum(1 for line, exact in zip(float_lines, cent_lines) if round(line * 100) != exact)
+    print(f"  exact total {exact_cents / 100:.2f}, float total of rounded lines {float_total!r}")
+    print(f"  lines where float rounding disagrees with exact half-up cents: {mismatched:,}")
+
+    # The real order path, best of 3 per call
+    print(f"  order path Money   {order_path()}")
+    if float_revision is not None:
+        print(f"  order path float   {float_order_path(float_revision)}   ({float_revision})")
+
+if __name__ == "__main__":
+    main()
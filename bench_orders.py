@@ -0,0 +1,203 @@
+# bench_orders.py
+"""
+Benchmark suite for order processing: Store.order, Product.buy,
+Store.quote (promotion pricing) and get_all_products, over a grid of
+catalog sizes, order mixes and promotion mixes.
+
+The order_bulk benchmarks place orders of --bulk-lines lines (10,000 by
+default) through the checked path (order), the non-raising path
+(order with raise_errors=False) and the trusted fast path
+(order with trusted=True), to show the per-line validation overhead.
+
+Every operation is timed call by call, and each benchmark reports its
+throughput (ops/sec, best of three passes) and its p50 and p99 latency. Results can be saved
+as a JSON baseline and later runs compared against it; a benchmark whose
+throughput drops by more than the threshold counts as a regression and
+makes the run exit with status 1.
+
+Usage:
+    python bench_orders.py [--sizes 100,10000] [--operations 20000] [--bulk-lines 10000]
+                           [--save baseline.json] [--compare baseline.json]
+                           [--threshold 0.15]
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import products
+import promotions
+import store
+from typing import Callable, Dict, List
+
+# Order mixes: how many lines an order has and which product kinds it draws from
+ORDER_MIXES = {
+    "single": {"lines": 1, "kinds": ("stocked",)},
+    "basket": {"lines": 5, "kinds": ("stocked", "stocked", "stocked", "non_stocked", "limited")},
+}
+
+# Promotion mixes: the share of products carrying each promotion
+PROMOTION_MIXES = {
+    "none": {},
+    "mixed": {"second_half": 0.2, "third_free": 0.2, "percent": 0.2},
+}
+
+def make_catalog(size: int, promotion_mix: Dict[str, float], rng: random.Random) -> Dict[str, List[products.Product]]:
+    """Builds size products (80% stocked, 10% non-stocked, 10% limited) with promotions per the mix."""
+    shared = {"second_half": promotions.SecondHalfPrice("Second Half price!"),
+              "third_free": promotions.ThirdOneFree("Third One Free!"),
+              "percent": promotions.PercentDiscount("30% off!", percent=30)}
+    catalog: Dict[str, List[products.Product]] = {"stocked": [], "non_stocked": [], "limited": []}
+    for index in range(size):
+        price = rng.randrange(100, 200_000) / 100
+        if index % 10 == 8:
+            product = products.NonStockedProduct(f"License {index}", price=price)
+            catalog["non_stocked"].append(product)
+        elif index % 10 == 9:
+            product = products.LimitedProduct(f"Shipping {index}", price=price, quantity=10**12, maximum=1)
+            catalog["limited"].append(product)
+        else:
+            product = products.Product(f"Product {index}", price=price, quantity=10**12)
+            catalog["stocked"].append(product)
+        draw = rng.random()
+        for promotion_name, share in promotion_mix.items():
+            if draw < share:
+                product.promotion = shared[promotion_name]
+                break
+            draw -= share
+    return catalog
+
+def make_orders(catalog: Dict[str, List[products.Product]], order_mix: Dict, count: int,
+                rng: random.Random) -> List[list]:
+    """Builds count shopping lists following an order mix."""
+    orders = []
+    for _ in range(count):
+        shopping_list = []
+        for kind in order_mix["kinds"][:order_mix["lines"]]:
+            candidates = catalog[kind] or catalog["stocked"]
+            product = rng.choice(candidates)
+            quantity = 1 if isinstance(product, products.LimitedProduct) else rng.randrange(1, 5)
+            shopping_list.append((product, quantity))
+        orders.append(shopping_list)
+    return orders
+
+def make_bulk_orders(catalog: Dict[str, List[products.Product]], lines: int, count: int,
+                     rng: random.Random) -> List[list]:
+    """Builds count shopping lists of lines lines each, from stocked and non-stocked products."""
+    candidates = catalog["stocked"] + catalog["non_stocked"]
+    return [[(rng.choice(candidates), rng.randrange(1, 5)) for _ in range(lines)] for _ in range(count)]
+
+def measure(operation: Callable, arguments: list, repeat: int = 3) -> Dict[str, float]:
+    """
+    Calls operation once per argument, timing each call; returns ops/sec, p50 and p99 in microseconds.
+
+    The arguments are run through repeat times with the garbage collector
+    paused; throughput is the best pass, latencies cover every call.
+    """
+    clock = time.perf_counter_ns
+    latencies = []
+    best_seconds = float("inf")
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            pass_latencies = []
+            append = pass_latencies.append
+            for argument in arguments:
+                start = clock()
+                operation(argument)
+                append(clock() - start)
+            best_seconds = min(best_seconds, sum(pass_latencies) / 1e9)
+            latencies.extend(pass_latencies)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    latencies.sort()
+    return {"ops_per_sec": len(arguments) / best_seconds if best_seconds else float("inf"),
+            "p50_us": latencies[len(latencies) // 2] / 1e3,
+            "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] / 1e3}
+
+def run(sizes: List[int], operations: int, bulk_lines: int = 10_000, seed: int = 42) -> Dict[str, Dict[str, float]]:
+    """Runs every benchmark of the grid; returns {benchmark name: measurements}."""
+    results = {}
+    for size in sizes:
+        for promotion_name, promotion_mix in PROMOTION_MIXES.items():
+            rng = random.Random(seed)
+            catalog = make_catalog(size, promotion_mix, rng)
+            best_buy = store.Store([product for group in catalog.values() for product in group])
+            prefix = f"size={size}/promotions={promotion_name}"
+
+            for mix_name, order_mix in ORDER_MIXES.items():
+                orders = make_orders(catalog, order_mix, operations, rng)
+                promotions.quote_cache.clear()
+                results[f"{prefix}/order/{mix_name}"] = measure(best_buy.order, orders)
+                promotions.quote_cache.clear()
+                results[f"{prefix}/quote/{mix_name}"] = measure(best_buy.quote, orders)
+
+            bulk_orders = make_bulk_orders(catalog, bulk_lines, max(3, operations * 10 // bulk_lines), rng)
+            results[f"{prefix}/order_bulk/checked"] = measure(best_buy.order, bulk_orders)
+            results[f"{prefix}/order_bulk/result"] = measure(lambda order: best_buy.order(order, raise_errors=False),
+                                                             bulk_orders)
+            results[f"{prefix}/order_bulk/trusted"] = measure(lambda order: best_buy.order(order, trusted=True),
+                                                              bulk_orders)
+
+            lines = [line for order in make_orders(catalog, ORDER_MIXES["single"], operations, rng) for line in order]
+            results[f"{prefix}/buy"] = measure(lambda line: line[0].buy(line[1]), lines)
+            results[f"{prefix}/get_all_products"] = measure(lambda _: best_buy.get_all_products(),
+                                                            range(max(1, operations // 10)))
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """Returns the names of benchmarks whose throughput fell more than threshold below the baseline."""
+    regressions = []
+    for name, measured in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        change = measured["ops_per_sec"] / reference["ops_per_sec"] - 1
+        marker = ""
+        if change < -threshold:
+            regressions.append(name)
+            marker = "  REGRESSION"
+        print(f"  {name:52} {change:+8.1%}{marker}")
+    return regressions
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Order-processing benchmarks")
+    parser.add_argument("--sizes", default="100,10000", help="comma-separated catalog sizes")
+    parser.add_argument("--operations", type=int, default=20_000, help="timed calls per benchmark")
+    parser.add_argument("--bulk-lines", type=int, default=10_000, help="lines per order in the order_bulk benchmarks")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed throughput drop before a benchmark counts as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run(sizes, args.operations, args.bulk_lines)
+
+    print(f"{'benchmark':52} {'ops/sec':>12} {'p50 us':>9} {'p99 us':>9}")
+    for name, measured in results.items():
+        print(f"{name:52} {measured['ops_per_sec']:12,.0f} {measured['p50_us']:9.2f} {measured['p99_us']:9.2f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as baseline_file:
+            json.dump({"python": platform.python_version(), "operations": args.operations,
+                       "results": results}, baseline_file, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        print(f"Throughput change against {args.compare}:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+# catalog.py
+"""
+Streaming catalog import and export.
+
+Catalog files are read row by row and handed to the store in chunks via
+add_products (store.Store and sqlite_store.SQLiteStore both have it), so
+memory use does not grow with the file beyond what the store itself keeps.
+Exports walk the store with iter_products and write one product at a time.
+
+CSV files have a header row with these columns (only name and price are
+required; empty cells use the defaults):
+
+    type            Product (default), NonStockedProduct or LimitedProduct
+    name, price     price in currency units, e.g. 19.99
+    quantity        default 0
+    maximum         LimitedProduct only
+    promotion_type  PercentDiscount, SecondHalfPrice, ThirdOneFree, ...
+    promotion_name
+    percent         PercentDiscount only
+
+JSON Lines files have one product per line in the format of
+Product.to_dict().
+
+Products naming the same promotion (same type, name and settings) share
+one Promotion object.
+
+Snapshots are a compact binary format for backups: a magic header, then
+tagged records, each promotion written once before the first product
+that uses it:
+
+    b'P' u32 promotion id, u32 length, promotion dict as UTF-8 JSON
+    b'R' u8 kind, i64 price cents, i64 quantity, i64 maximum,
+         i32 promotion id (-1 = none), u16 name length, UTF-8 name
+    b'E' end of snapshot
+
+Loading a snapshot rebuilds products without re-running the Product
+constructors' validation, since the data was valid when it was written.
+"""
+import csv
+import json
+import struct
+from contextlib import contextmanager
+from itertools import islice
+import products
+import promotions
+from money import Money
+from typing import Any, Dict, IO, Iterator, Optional, Union
+
+PathOrFile = Union[str, IO]
+
+@contextmanager
+def _opened(source: PathOrFile, mode: str = 'r'):
+    """Yields an open file for a path, or the given file object unchanged."""
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        if 'b' in mode:
+            with open(source, mode) as file:
+                yield file
+        else:
+            with open(source, mode, encoding='utf-8', newline='') as file:
+                yield file
+    else:
+        yield source
+
+class _PromotionPool:
+    """Shares one Promotion object per distinct promotion dict."""
+    def __init__(self):
+        self._promotions: Dict[str, promotions.Promotion] = {}
+
+    def get(self, data: Optional[Dict[str, Any]]) -> Optional[promotions.Promotion]:
+        if not data:
+            return None
+        key = json.dumps(data, sort_keys=True)
+        promotion = self._promotions.get(key)
+        if promotion is None:
+            promotion = self._promotions[key] = promotions.from_dict(data)
+        return promotion
+
+def _from_record(data: Dict[str, Any], pool: _PromotionPool) -> products.Product:
+    """Builds a product from a to_dict-style record, sharing its promotion through pool."""
+    promotion = data.get("promotion")
+    product = products.from_dict({**data, "promotion": None})
+    product.promotion = pool.get(promotion)
+    return product
+
+def _csv_record(row: Dict[str, str]) -> Dict[str, Any]:
+    """Converts one CSV row into a to_dict-style record."""
+    def cell(column: str) -> Optional[str]:
+        value = row.get(column)
+        return value.strip() if value and value.strip() else None
+
+    record: Dict[str, Any] = {"type": cell("type") or "Product",
+                              "name": cell("name"),
+                              "price": cell("price"),
+                              "quantity": int(cell("quantity") or 0)}
+    if record["name"] is None or record["price"] is None:
+        raise ValueError("name and price are required.")
+    if cell("maximum") is not None:
+        record["maximum"] = int(cell("maximum"))
+    promotion_type = cell("promotion_type")
+    if promotion_type is not None:
+        promotion: Dict[str, Any] = {"type": promotion_type, "name": cell("promotion_name") or promotion_type}
+        if cell("percent") is not None:
+            promotion["percent"] = float(cell("percent"))
+        record["promotion"] = promotion
+    return record
+
+def iter_csv(source: PathOrFile) -> Iterator[products.Product]:
+    """Yields the products of a CSV catalog one at a time."""
+    pool = _PromotionPool()
+    with _opened(source) as file:
+        for line_number, row in enumerate(csv.DictReader(file), start=2):
+            try:
+                yield _from_record(_csv_record(row), pool)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid product on line {line_number}: {e}") from e
+
+def iter_jsonl(source: PathOrFile) -> Iterator[products.Product]:
+    """Yields the products of a JSON Lines catalog one at a time."""
+    pool = _PromotionPool()
+    with _opened(source) as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield _from_record(json.loads(line), pool)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid product on line {line_number}: {e}") from e
+
+def load(store_instance, product_iterator: Iterator[products.Product], chunk_size: int = 1000) -> int:
+    """Adds products to a store in chunks of chunk_size; returns how many were added."""
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be positive.")
+    count = 0
+    while True:
+        chunk = list(islice(product_iterator, chunk_size))
+        if not chunk:
+            return count
+        store_instance.add_products(chunk)
+        count += len(chunk)
+
+def import_csv(store_instance, source: PathOrFile, chunk_size: int = 1000) -> int:
+    """Streams a CSV catalog into a store; returns the number of products imported."""
+    return load(store_instance, iter_csv(source), chunk_size)
+
+def import_jsonl(store_instance, source: PathOrFile, chunk_size: int = 1000) -> int:
+    """Streams a JSON Lines catalog into a store; returns the number of products imported."""
+    return load(store_instance, iter_jsonl(source), chunk_size)
+
+# --- Export ---
+
+def iter_jsonl_lines(store_instance) -> Iterator[str]:
+    """Yields one JSON line (Product.to_dict format) per product in the store."""
+    for product in store_instance.iter_products():
+        yield json.dumps(product.to_dict(), separators=(',', ':')) + '\n'
+
+def export_jsonl(store_instance, destination: PathOrFile) -> int:
+    """Writes every product of a store as JSON Lines; returns the number written."""
+    count = 0
+    with _opened(destination, 'w') as file:
+        for line in iter_jsonl_lines(store_instance):
+            file.write(line)
+            count += 1
+    return count
+
+# --- Binary snapshots ---
+
+_SNAPSHOT_MAGIC = b'BBSNAP01'
+_PROMOTION_HEADER = struct.Struct('<II')
+_PRODUCT_RECORD = struct.Struct('<BqqqiH')
+_KIND_CLASSES = {0: products.Product, 1: products.NonStockedProduct, 2: products.LimitedProduct}
+
+def _kind(product: products.Product) -> int:
+    """Returns the snapshot kind code of a product."""
+    if isinstance(product, products.NonStockedProduct):
+        return 1
+    if isinstance(product, products.LimitedProduct):
+        return 2
+    return 0
+
+def write_snapshot(store_instance, destination: PathOrFile) -> int:
+    """Streams a binary snapshot of a store; returns the number of products written."""
+    promotion_ids: Dict[int, int] = {}
+    count = 0
+    with _opened(destination, 'wb') as file:
+        file.write(_SNAPSHOT_MAGIC)
+        for product in store_instance.iter_products():
+            promotion = product.promotion
+            promotion_id = -1
+            if promotion is not None:
+                promotion_id = promotion_ids.get(id(promotion), -1)
+                if promotion_id < 0:
+                    promotion_id = promotion_ids[id(promotion)] = len(promotion_ids)
+                    encoded = json.dumps(promotion.to_dict()).encode('utf-8')
+                    file.write(b'P' + _PROMOTION_HEADER.pack(promotion_id, len(encoded)) + encoded)
+            name = product.name.encode('utf-8')
+            kind = _kind(product)
+            file.write(b'R' + _PRODUCT_RECORD.pack(kind, product.price.cents, product.quantity,
+                                                   product.maximum if kind == 2 else 0,
+                                                   promotion_id, len(name)) + name)
+            count += 1
+        file.write(b'E')
+    return count
+
+def iter_snapshot(source: PathOrFile) -> Iterator[products.Product]:
+    """Yields the products of a binary snapshot one at a time."""
+    restore = products._restore
+    promotions_by_id: Dict[int, promotions.Promotion] = {}
+    with _opened(source, 'rb') as file:
+        if file.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+            raise ValueError("Not a catalog snapshot.")
+        read = file.read
+        try:
+            yield from _read_records(read, restore, promotions_by_id)
+        except (struct.error, KeyError, UnicodeDecodeError) as e:
+            raise ValueError(f"Truncated or corrupt snapshot: {e}") from e
+
+def _read_records(read, restore, promotions_by_id: Dict[int, promotions.Promotion]) -> Iterator[products.Product]:
+    """Yields the products of the records following a snapshot's header."""
+    while True:
+        tag = read(1)
+        if tag == b'R':
+            kind, price_cents, quantity, maximum, promotion_id, name_length = \
+                _PRODUCT_RECORD.unpack(read(_PRODUCT_RECORD.size))
+            name = read(name_length).decode('utf-8')
+            yield restore(_KIND_CLASSES[kind], name, Money(price_cents), quantity,
+                          promotions_by_id[promotion_id] if promotion_id >= 0 else None, maximum)
+        elif tag == b'P':
+            promotion_id, length = _PROMOTION_HEADER.unpack(read(_PROMOTION_HEADER.size))
+            promotions_by_id[promotion_id] = promotions.from_dict(json.loads(read(length)))
+        elif tag == b'E':
+            return
+        else:
+            raise ValueError("Truncated or corrupt snapshot.")
+
+def read_snapshot(store_instance, source: PathOrFile, chunk_size: int = 1000) -> int:
+    """Loads a binary snapshot into a store; returns the number of products loaded."""
+    return load(store_instance, iter_snapshot(source), chunk_size)
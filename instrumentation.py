@@ -0,0 +1,105 @@
+# instrumentation.py
+"""
+Opt-in timing of the order hot path.
+
+When enabled, Store.order and Product.buy record how long each stage
+takes and how often it runs:
+
+    validation         Store._validate_order, Product.validate_purchase
+    stock_check        Store._check_demand, Product.check_stock
+    promotion_pricing  Product._cents_for (promotion or plain price)
+    decrement          the quantity update in Product.buy
+
+Store.order calls Product.buy per line, so one order records its own
+validation and stock check plus those of every line.
+
+Instrumentation is off by default. Instrumented code tests the module
+flag ENABLED once per call and takes its usual path when it is false,
+so the cost when disabled is one global lookup. Turn it on with
+enable() (or the enabled() context manager) and read the results from
+registry.snapshot().
+"""
+import threading
+from contextlib import contextmanager
+from time import perf_counter_ns
+from typing import Dict, Iterator
+
+ENABLED = False
+
+STAGES = ("validation", "stock_check", "promotion_pricing", "decrement")
+
+class StageStats:
+    """Call count and timings of one stage, in nanoseconds."""
+    __slots__ = ('calls', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+class Registry:
+    """Thread-safe collection of StageStats by stage name."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageStats] = {}
+
+    def record(self, stage: str, elapsed_ns: int):
+        """Adds one timed call of a stage."""
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.calls += 1
+            stats.total_ns += elapsed_ns
+            if elapsed_ns > stats.max_ns:
+                stats.max_ns = elapsed_ns
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Returns {stage: {"calls", "total_seconds", "mean_us", "max_us"}} for every stage seen so far."""
+        with self._lock:
+            return {stage: {"calls": stats.calls,
+                            "total_seconds": stats.total_ns / 1e9,
+                            "mean_us": stats.total_ns / stats.calls / 1e3,
+                            "max_us": stats.max_ns / 1e3}
+                    for stage, stats in self._stages.items()}
+
+    def reset(self):
+        """Forgets everything recorded so far."""
+        with self._lock:
+            self._stages.clear()
+
+registry = Registry()
+
+class stage:
+    """Context manager timing its block as one call of a stage in the registry."""
+    __slots__ = ('name', '_start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+
+    def __exit__(self, *exc_info):
+        registry.record(self.name, perf_counter_ns() - self._start)
+
+def enable():
+    """Turns instrumentation on for every store and product."""
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    """Turns instrumentation off; recorded timings are kept."""
+    global ENABLED
+    ENABLED = False
+
+@contextmanager
+def enabled() -> Iterator[Registry]:
+    """Turns instrumentation on for the duration of a with block and yields the registry."""
+    was_enabled = ENABLED
+    enable()
+    try:
+        yield registry
+    finally:
+        if not was_enabled:
+            disable()
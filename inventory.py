@@ -0,0 +1,377 @@
+# inventory.py
+import threading
+import weakref
+from array import array
+from money import Money
+import products
+import promotions
+import store
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Values of the 'kinds' column
+KIND_STOCKED = 0
+KIND_NON_STOCKED = 1
+KIND_LIMITED = 2
+
+class ColumnarInventory:
+    """
+    Column-oriented product storage.
+
+    Each field lives in its own array (price, quantity, active flag,
+    purchase maximum, product kind, promotion id) and a product is just a
+    row number, so a large catalog costs a few dozen bytes per product
+    instead of a full object. Product views over rows are created on
+    demand; they behave like regular products (buy, properties, Store
+    membership) but read and write the columns directly.
+
+    Rows are never deleted: removing a view from a Store leaves its row
+    in place. to_store() returns an InventoryStore, which keeps row numbers
+    rather than views, so it costs no object per row either.
+    """
+    def __init__(self):
+        """Creates an empty inventory."""
+        self.names: List[str] = []
+        self.prices = array('q') # Integer cents
+        self.quantities = array('q')
+        self.actives = array('b')
+        self.maximums = array('q')
+        self.kinds = array('b')
+        self.promotion_ids = array('i') # -1 = no promotion
+        # Promotion table referenced by promotion_ids, with its reverse index
+        self.promotions: List[promotions.Promotion] = []
+        self._promotion_ids: Dict[int, int] = {}
+        # name -> first row with that name
+        self._rows_by_name: Dict[str, int] = {}
+        # row -> live view, so a row has at most one view at a time
+        self._views: 'weakref.WeakValueDictionary[int, products.Product]' = weakref.WeakValueDictionary()
+        # Serializes view creation, so two threads cannot build two views (and two locks) of one row
+        self._views_lock = threading.Lock()
+        # InventoryStores sitting on this inventory; every view notifies them of quantity changes
+        self._stores: tuple = ()
+
+    def __len__(self) -> int:
+        """Returns the number of rows."""
+        return len(self.names)
+
+    # --- Adding rows ---
+    def add(self, name: str, price: float, quantity: int = 0, maximum: int = 0,
+            kind: int = KIND_STOCKED, promotion: Optional[promotions.Promotion] = None) -> int:
+        """Appends a product row after the same checks Product applies; returns the row."""
+        if not name:
+            raise ValueError("Product name cannot be empty.")
+        price = Money.of(price)
+        if price < 0:
+            raise ValueError("Product price cannot be negative.")
+        if quantity < 0:
+            raise ValueError("Quantity cannot be negative.")
+        if kind not in (KIND_STOCKED, KIND_NON_STOCKED, KIND_LIMITED):
+            raise ValueError(f"Unknown product kind: {kind}")
+        if kind == KIND_LIMITED and maximum <= 0:
+            raise ValueError("Maximum purchase quantity must be positive.")
+        if kind == KIND_NON_STOCKED:
+            quantity = 0
+
+        row = self._append_row(name, price.cents, quantity, kind == KIND_NON_STOCKED or quantity > 0,
+                               maximum, kind, self._promotion_id(promotion))
+        self._rows_by_name.setdefault(name, row)
+        return row
+
+    def _append_row(self, name: str, price_cents: int, quantity: int, active: bool,
+                    maximum: int, kind: int, promotion_id: int) -> int:
+        """Appends already validated values to every column; returns the new row."""
+        row = len(self.names)
+        self.names.append(name)
+        self.prices.append(price_cents)
+        self.quantities.append(quantity)
+        self.actives.append(active)
+        self.maximums.append(maximum)
+        self.kinds.append(kind)
+        self.promotion_ids.append(promotion_id)
+        return row
+
+    def add_product(self, product: products.Product) -> int:
+        """Copies an existing product into a new row; returns the row."""
+        if isinstance(product, products.NonStockedProduct):
+            kind, maximum = KIND_NON_STOCKED, 0
+        elif isinstance(product, products.LimitedProduct):
+            kind, maximum = KIND_LIMITED, product.maximum
+        elif isinstance(product, products.Product):
+            kind, maximum = KIND_STOCKED, 0
+        else:
+            raise TypeError("Only Product objects can be added.")
+        return self.add(product.name, product.price, product.quantity, maximum, kind, product.promotion)
+
+    def _promotion_id(self, promotion: Optional[promotions.Promotion]) -> int:
+        """Returns the promotion table index for promotion, adding it if needed."""
+        if promotion is None:
+            return -1
+        if not isinstance(promotion, promotions.Promotion):
+            raise TypeError("Invalid promotion type provided.")
+        promotion_id = self._promotion_ids.get(id(promotion))
+        if promotion_id is None:
+            promotion_id = self._promotion_ids[id(promotion)] = len(self.promotions)
+            self.promotions.append(promotion)
+        return promotion_id
+
+    # --- Reading rows ---
+    def row(self, name: str) -> int:
+        """Returns the first row with the given name."""
+        try:
+            return self._rows_by_name[name]
+        except KeyError:
+            raise KeyError(f"Product '{name}' not found.") from None
+
+    def view(self, row: int) -> products.Product:
+        """Returns the product view for a row, reusing a live one if there is one."""
+        view = self._views.get(row)
+        if view is not None:
+            return view
+        with self._views_lock:
+            view = self._views.get(row) # Another thread may have created it meanwhile
+            if view is None:
+                if not 0 <= row < len(self):
+                    raise IndexError(f"Row {row} out of range.")
+                view_class = _VIEW_CLASSES[self.kinds[row]]
+                view = view_class.__new__(view_class)
+                view._inventory = self
+                view._row = row
+                view._stores = self._stores
+                view._lock = None
+                self._views[row] = view
+        return view
+
+    def get(self, name: str) -> Optional[products.Product]:
+        """Returns the view for the first row with the given name, or None."""
+        row = self._rows_by_name.get(name)
+        return None if row is None else self.view(row)
+
+    def products(self) -> Iterator[products.Product]:
+        """Yields a view for every row, in row order."""
+        for row in range(len(self)):
+            yield self.view(row)
+
+    def total_quantity(self) -> int:
+        """Returns the summed quantity column."""
+        return sum(self.quantities)
+
+    def to_store(self, thread_safe: bool = False) -> 'InventoryStore':
+        """Returns a Store holding every current row, without creating a view per row."""
+        return InventoryStore(self, thread_safe=thread_safe)
+
+class InventoryStore(store.Store):
+    """
+    Store sitting directly on a ColumnarInventory.
+
+    It holds the rows the inventory had when the store was created, plus
+    rows added later with add_product(inventory.view(row)), as row
+    numbers: the total quantity is summed from the quantity column once
+    and then kept current by the views, name lookups go through the
+    inventory's name index, and views are only created for the products
+    that are returned. Orders, quotes and reservations work as in Store.
+
+    Only products of its own inventory can be added. Like
+    Store.add_products, creating the store must not race with purchases.
+    """
+    def __init__(self, columns: ColumnarInventory, thread_safe: bool = False):
+        """Creates a store holding every current row of columns."""
+        super().__init__([], thread_safe=thread_safe)
+        self.inventory = columns
+        # Rows below _size belong to the store unless removed; later rows once added
+        self._size = len(columns)
+        self._removed: Set[int] = set()
+        self._appended: Dict[int, None] = {} # Insertion-ordered set
+        self._total_quantity = columns.total_quantity()
+        columns._stores += (self,)
+        for view in list(columns._views.values()):
+            view._stores += (self,)
+
+    def _holds(self, row: int) -> bool:
+        """True if the row belongs to the store."""
+        if row < self._size:
+            return row not in self._removed
+        return row in self._appended
+
+    def _row_of(self, product: products.Product) -> Optional[int]:
+        """Returns the row of a product of this store, or None."""
+        if getattr(product, '_inventory', None) is not self.inventory:
+            return None
+        return product._row if self._holds(product._row) else None
+
+    def _rows(self) -> List[int]:
+        """Returns the store's rows in order: the original ones, then the added ones."""
+        removed = self._removed
+        rows = [row for row in range(self._size) if row not in removed] if removed else list(range(self._size))
+        rows.extend(self._appended)
+        return rows
+
+    def _add(self, product: products.Product):
+        """Adds a row back (or a row created after the store). Caller holds the store lock."""
+        if getattr(product, '_inventory', None) is not self.inventory:
+            raise TypeError("Only products of the store's inventory can be added.")
+        row = product._row
+        if self._holds(row):
+            return
+        if row < self._size:
+            self._removed.discard(row)
+        else:
+            self._appended[row] = None
+        self._total_quantity += product.quantity
+        if self.log is not None:
+            self.log.log_add(product)
+
+    def remove_product(self, product: products.Product):
+        """Removes a product from the store; its row stays in the inventory."""
+        with product.lock, self._lock:
+            row = self._row_of(product)
+            if row is None:
+                raise ValueError(f"Product '{product.name}' not found.")
+            if row < self._size:
+                self._removed.add(row)
+            else:
+                del self._appended[row]
+            self._total_quantity -= product.quantity
+            if self.log is not None:
+                self.log.log_remove(product)
+        self._wait_for_log()
+
+    def iter_products(self) -> Iterator[products.Product]:
+        """Yields a view for every product (active or not), created as the iteration reaches it."""
+        view = self.inventory.view
+        return (view(row) for row in self._rows())
+
+    def snapshot_products(self) -> Tuple[products.Product, ...]:
+        """Returns a view for every product (active or not), with the rows read under the store lock."""
+        with self._lock:
+            rows = self._rows()
+        view = self.inventory.view
+        return tuple(view(row) for row in rows)
+
+    def get_product(self, name: str) -> Optional[products.Product]:
+        """Returns the first product added under the given name, or None."""
+        columns = self.inventory
+        row = columns._rows_by_name.get(name)
+        if row is None:
+            return None
+        if not self._holds(row):
+            # The first row of that name was removed; look for a later one
+            names = columns.names
+            row = next((row for row in self._rows() if names[row] == name), None)
+            if row is None:
+                return None
+        return columns.view(row)
+
+    def get_all_products(self) -> Sequence[products.Product]:
+        """Returns the active products, creating their views; O(rows), not cached."""
+        actives = self.inventory.actives
+        with self._lock:
+            rows = [row for row in self._rows() if actives[row]]
+        view = self.inventory.view
+        return tuple(view(row) for row in rows)
+
+    def _on_quantity_change(self, product: products.Product, delta: int, flipped: bool):
+        """Called by a view's quantity setter; rows outside the store are ignored."""
+        with self._lock:
+            if self._holds(product._row):
+                self._total_quantity += delta
+                if self.log is not None:
+                    self.log.log_quantity(product, self._logged_quantity(product))
+
+    def __contains__(self, product: products.Product) -> bool:
+        """Checks if a product is a view of one of the store's rows."""
+        return self._row_of(product) is not None
+
+    def __len__(self) -> int:
+        """Returns the number of products (active or not) in the store."""
+        return self._size - len(self._removed) + len(self._appended)
+
+# --- Row-backed views ---
+
+def _column_property(column: str, doc: str) -> property:
+    """Builds a property that reads and writes one column at the view's row."""
+    def getter(view):
+        return getattr(view._inventory, column)[view._row]
+
+    def setter(view, value):
+        getattr(view._inventory, column)[view._row] = value
+
+    return property(getter, setter, doc=doc)
+
+class _RowBacked:
+    """
+    Mixin that moves Product's storage attributes into inventory columns.
+
+    Product's own properties and methods keep working unchanged because
+    they only ever touch these underlying attributes.
+    """
+    __slots__ = ()
+
+    _quantity = _column_property('quantities', "Quantity column.")
+
+    @property
+    def _price(self) -> Money:
+        """Price column, in cents."""
+        return Money(self._inventory.prices[self._row])
+
+    @_price.setter
+    def _price(self, value: Money):
+        self._inventory.prices[self._row] = value.cents
+
+    @property
+    def _active(self) -> bool:
+        """Active flag column."""
+        return bool(self._inventory.actives[self._row])
+
+    @_active.setter
+    def _active(self, value: bool):
+        self._inventory.actives[self._row] = bool(value)
+
+    @property
+    def _promotion(self) -> Optional[promotions.Promotion]:
+        """Promotion id column, resolved through the promotion table."""
+        promotion_id = self._inventory.promotion_ids[self._row]
+        return None if promotion_id < 0 else self._inventory.promotions[promotion_id]
+
+    @_promotion.setter
+    def _promotion(self, value: Optional[promotions.Promotion]):
+        self._inventory.promotion_ids[self._row] = self._inventory._promotion_id(value)
+
+    @property
+    def name(self) -> str:
+        """Name column."""
+        return self._inventory.names[self._row]
+
+    @name.setter
+    def name(self, value: str):
+        inventory = self._inventory
+        row = self._row
+        old = inventory.names[row]
+        inventory.names[row] = value
+        rows_by_name = inventory._rows_by_name
+        if rows_by_name.get(old) == row:
+            # Later rows may still carry the old name; the next one becomes the first
+            names = inventory.names
+            later = next((other for other in range(row + 1, len(inventory)) if names[other] == old), None)
+            if later is None:
+                del rows_by_name[old]
+            else:
+                rows_by_name[old] = later
+        first = rows_by_name.get(value)
+        if first is None or first > row:
+            rows_by_name[value] = row
+
+class ProductRow(_RowBacked, products.Product):
+    """Product view over an inventory row."""
+    __slots__ = ('_inventory', '_row')
+
+class NonStockedProductRow(_RowBacked, products.NonStockedProduct):
+    """NonStockedProduct view over an inventory row."""
+    __slots__ = ('_inventory', '_row')
+
+class LimitedProductRow(_RowBacked, products.LimitedProduct):
+    """LimitedProduct view over an inventory row."""
+    __slots__ = ('_inventory', '_row')
+    maximum = _column_property('maximums', "Purchase maximum column.")
+
+_VIEW_CLASSES = {KIND_STOCKED: ProductRow,
+                 KIND_NON_STOCKED: NonStockedProductRow,
+                 KIND_LIMITED: LimitedProductRow}
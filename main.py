@@ -3,6 +3,9 @@ import products
 import store
 # promotions import moved to setup_store function
 
+# Seconds a cart's items stay reserved while the order is being put together
+CART_TTL = 15 * 60
+
 # The start() function remains the same as before, allowing menu interaction
 def start(store_instance: store.Store):
     """
@@ -57,6 +60,9 @@ def start(store_instance: store.Store):
                 print("Wenn Sie die Bestellung abschließen möchten, geben Sie leeren Text ein.")
 
                 shopping_list = []
+                # The chosen items are reserved while the customer is still
+                # choosing, so nobody else can buy them before checkout
+                cart = None
 
                 while True:
                     product_choice_str = input("Welche Produktnummer möchten Sie? ")
@@ -70,8 +76,12 @@ def start(store_instance: store.Store):
                         if 0 <= product_index < len(active_products):
                             chosen_product = active_products[product_index]
                             if amount > 0:
-                                shopping_list.append((chosen_product, amount))
-                                print("Produkt zur Liste hinzugefügt!")
+                                try:
+                                    cart = store_instance.reserve([(chosen_product, amount)], CART_TTL, cart)
+                                    shopping_list.append((chosen_product, amount))
+                                    print("Produkt zur Liste hinzugefügt und reserviert!")
+                                except Exception as reserve_ex:
+                                    print(f"Kann nicht reserviert werden: {reserve_ex}")
                             else:
                                 print("Die Menge muss positiv sein.")
                         else:
@@ -87,7 +97,7 @@ def start(store_instance: store.Store):
                 if shopping_list:
                     print("********")
                     try:
-                        total_cost = store_instance.order(shopping_list)
+                        total_cost = store_instance.order(cart)
                         print(f"Bestellung aufgegeben! Gesamtbetrag: ${total_cost:.2f}")
                     # Renamed inner exception variable 'e' to 'order_ex' to avoid shadowing
                     except Exception as order_ex:
@@ -111,8 +121,8 @@ def start(store_instance: store.Store):
             print(f"Ein unerwarteter Fehler im Menü ist aufgetreten: {menu_ex}")
 
 
-def setup_store() -> store.Store:
-    """Sets up the initial store inventory and promotions."""
+def default_products() -> list:
+    """Builds the initial inventory and assigns promotions."""
     # Import promotions only where needed
     import promotions
 
@@ -134,16 +144,43 @@ def setup_store() -> store.Store:
     product_list[1].promotion = third_one_free     # Bose
     product_list[3].promotion = thirty_percent     # Windows License
 
+    return product_list
+
+
+def setup_store() -> store.Store:
+    """Sets up the initial store inventory and promotions."""
     # Create and return the Store instance
-    return store.Store(product_list)
+    return store.Store(default_products())
+
+
+def setup_persistent_store(path: str) -> store.Store:
+    """
+    Opens the store saved in the inventory file at path.
+
+    A new file is seeded with the default inventory; afterwards every
+    purchase is written to the file in place and survives a restart.
+    Opening only maps the file: the store sits on the inventory columns
+    (see inventory.InventoryStore), so no product object is built until
+    a product is listed or looked up.
+    """
+    import mapped_inventory
+
+    inventory = mapped_inventory.MappedInventory(path)
+    if len(inventory) == 0:
+        for product in default_products():
+            inventory.add_product(product)
+    return inventory.to_store()
 
 
 # --- Main execution block: Now calls setup function ---
 if __name__ == "__main__":
+    import sys
+
     print("--- Best Buy Store 2.0 ---")
     try:
-        # Get the initialized store from the setup function
-        best_buy = setup_store()
+        # Get the initialized store from the setup function; an optional
+        # inventory file argument makes the stock persistent
+        best_buy = setup_persistent_store(sys.argv[1]) if len(sys.argv) > 1 else setup_store()
         # Start the user interface
         start(best_buy)
 
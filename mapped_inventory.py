@@ -0,0 +1,224 @@
+# mapped_inventory.py
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+import inventory
+import promotions
+from typing import Dict, List, Optional
+
+# File header: magic, format version, name width, row count, row capacity
+_HEADER = struct.Struct('<8sIIQQ')
+_HEADER_SIZE = 64
+_MAGIC = b'BBINV001'
+_VERSION = 1
+
+# Column name, item format, item size; in file order. The 8-byte columns
+# come first so every column starts suitably aligned for its cast.
+_COLUMNS = [('prices', 'q', 8),
+            ('quantities', 'q', 8),
+            ('maximums', 'q', 8),
+            ('promotion_ids', 'i', 4),
+            ('kinds', 'b', 1),
+            ('actives', 'b', 1)]
+
+class _NameColumn:
+    """Fixed-width, NUL-padded UTF-8 names stored in the mapped file."""
+    def __init__(self, owner: 'MappedInventory'):
+        self._owner = owner
+
+    def __len__(self) -> int:
+        return len(self._owner)
+
+    def __getitem__(self, row: int) -> str:
+        width = self._owner.name_width
+        start = self._owner._names_offset + row * width
+        return bytes(self._owner._map[start:start + width]).rstrip(b'\0').decode('utf-8')
+
+    def __setitem__(self, row: int, name: str):
+        width = self._owner.name_width
+        encoded = _encode_name(name, width)
+        start = self._owner._names_offset + row * width
+        self._owner._map[start:start + width] = encoded.ljust(width, b'\0')
+
+def _encode_name(name: str, width: int) -> bytes:
+    """Encodes a product name, checking that it fits the name column."""
+    encoded = name.encode('utf-8')
+    if len(encoded) > width or b'\0' in encoded:
+        raise ValueError(f"Product name '{name}' does not fit the {width}-byte name column.")
+    return encoded
+
+class MappedInventory(inventory.ColumnarInventory):
+    """
+    ColumnarInventory persisted in a memory-mapped file.
+
+    The columns are memoryviews straight into the file, so opening an
+    existing inventory only maps it (nothing is parsed) and every write
+    through a product view, e.g. the decrement in Product.buy, lands in the
+    file in place. The name index is built on the first lookup by name,
+    and to_store() creates no per-row objects, so a store over a large
+    file also opens in constant time.
+    Promotions are few and are kept in a small JSON file next to the data
+    file ('<path>.promotions.json').
+
+    Names are stored in a fixed-width column (name_width bytes of UTF-8,
+    chosen when the file is created). The file grows by doubling its row
+    capacity.
+    """
+    def __init__(self, path: str, capacity: int = 1024, name_width: int = 64):
+        """Opens the inventory at path, creating it with the given capacity and name width if missing."""
+        if capacity <= 0 or name_width <= 0:
+            raise ValueError("Capacity and name width must be positive.")
+        self.path = path
+        self._promotions_path = path + '.promotions.json'
+        self._views_by_column: Dict[str, memoryview] = {}
+        self._index: Optional[Dict[str, int]] = None
+        self._views = weakref.WeakValueDictionary()
+        self._views_lock = threading.Lock()
+        self._stores = ()
+
+        exists = os.path.exists(path) and os.path.getsize(path) >= _HEADER_SIZE
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            self._map = mmap.mmap(self._file.fileno(), 0)
+            magic, version, self.name_width, self._count, self._capacity = _HEADER.unpack_from(self._map, 0)
+            if magic != _MAGIC or version != _VERSION:
+                self.close()
+                raise ValueError(f"'{path}' is not an inventory file.")
+        else:
+            self.name_width, self._count, self._capacity = name_width, 0, capacity
+            self._file.truncate(self._file_size(capacity))
+            self._map = mmap.mmap(self._file.fileno(), 0)
+            self._write_header()
+        self._cast_columns()
+
+        self.promotions: List[promotions.Promotion] = []
+        self._promotion_ids = {}
+        if os.path.exists(self._promotions_path):
+            with open(self._promotions_path, encoding='utf-8') as promotions_file:
+                for data in json.load(promotions_file):
+                    promotion = promotions.from_dict(data)
+                    self._promotion_ids[id(promotion)] = len(self.promotions)
+                    self.promotions.append(promotion)
+
+    # --- Layout ---
+    def _offsets(self, capacity: int) -> Dict[str, int]:
+        """Returns the byte offset of every column (and 'names') for a capacity."""
+        offsets = {}
+        offset = _HEADER_SIZE
+        for column, _, size in _COLUMNS:
+            offsets[column] = offset
+            offset += size * capacity
+        offsets['names'] = offset
+        return offsets
+
+    def _file_size(self, capacity: int) -> int:
+        return self._offsets(capacity)['names'] + self.name_width * capacity
+
+    def _write_header(self):
+        _HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, self.name_width, self._count, self._capacity)
+
+    def _cast_columns(self):
+        """Points the column attributes at the current mapping."""
+        offsets = self._offsets(self._capacity)
+        whole = memoryview(self._map)
+        for column, item_format, size in _COLUMNS:
+            start = offsets[column]
+            view = whole[start:start + size * self._capacity].cast(item_format)
+            self._views_by_column[column] = view
+            setattr(self, column, view)
+        whole.release()
+        self._names_offset = offsets['names']
+        self.names = _NameColumn(self)
+
+    def _release_columns(self):
+        for view in self._views_by_column.values():
+            view.release()
+        self._views_by_column.clear()
+
+    def _grow(self, capacity: int):
+        """Enlarges the file to hold capacity rows, moving each column to its new offset."""
+        old_offsets = self._offsets(self._capacity)
+        new_offsets = self._offsets(capacity)
+        self._release_columns()
+        self._map.close()
+        self._file.truncate(self._file_size(capacity))
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        # Later columns move furthest, so move from the back to avoid overwriting
+        sizes = dict((column, size) for column, _, size in _COLUMNS)
+        sizes['names'] = self.name_width
+        for column in reversed(list(new_offsets)):
+            self._map.move(new_offsets[column], old_offsets[column], sizes[column] * self._count)
+        self._capacity = capacity
+        self._write_header()
+        self._cast_columns()
+
+    # --- ColumnarInventory hooks ---
+    def __len__(self) -> int:
+        return self._count
+
+    def _append_row(self, name: str, price_cents: int, quantity: int, active: bool,
+                    maximum: int, kind: int, promotion_id: int) -> int:
+        encoded = _encode_name(name, self.name_width)
+        if self._count == self._capacity:
+            self._grow(self._capacity * 2)
+        row = self._count
+        self.prices[row] = price_cents
+        self.quantities[row] = quantity
+        self.maximums[row] = maximum
+        self.promotion_ids[row] = promotion_id
+        self.kinds[row] = kind
+        self.actives[row] = int(active)
+        start = self._names_offset + row * self.name_width
+        self._map[start:start + self.name_width] = encoded.ljust(self.name_width, b'\0')
+        self._count += 1
+        self._write_header()
+        return row
+
+    def _promotion_id(self, promotion: Optional[promotions.Promotion]) -> int:
+        known = len(self.promotions)
+        promotion_id = super()._promotion_id(promotion)
+        if len(self.promotions) != known:
+            self._save_promotions()
+        return promotion_id
+
+    def _save_promotions(self):
+        """Rewrites the promotions file atomically."""
+        temporary_path = self._promotions_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as promotions_file:
+            json.dump([promotion.to_dict() for promotion in self.promotions], promotions_file)
+        os.replace(temporary_path, self._promotions_path)
+
+    @property
+    def _rows_by_name(self) -> Dict[str, int]:
+        """name -> first row, built on first use so opening stays O(1)."""
+        if self._index is None:
+            index: Dict[str, int] = {}
+            for row in range(self._count):
+                index.setdefault(self.names[row], row)
+            self._index = index
+        return self._index
+
+    def total_quantity(self) -> int:
+        return sum(self.quantities[:self._count])
+
+    # --- File handling ---
+    def flush(self):
+        """Writes dirty pages back to the file."""
+        self._map.flush()
+
+    def close(self):
+        """Flushes and unmaps the file; product views must not be used afterwards."""
+        self._release_columns()
+        if not self._map.closed:
+            self._map.flush()
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'MappedInventory':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
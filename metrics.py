@@ -0,0 +1,261 @@
+# metrics.py
+"""
+Store metrics in the Prometheus text exposition format.
+
+Once enabled, Store.order and Product.buy feed these series:
+
+    bestbuy_orders_total                     orders that went through
+    bestbuy_orders_failed_total{reason}      rejected orders, by reason
+    bestbuy_order_latency_seconds            histogram of Store.order time
+    bestbuy_revenue_cents_total{promotion}   revenue of every purchase, by
+                                             promotion name ("none" without)
+    bestbuy_stock_quantity{store,product}    current stock, read at scrape
+    bestbuy_stock_total{store}               time from the watched stores
+
+Orders per second is rate(bestbuy_orders_total[...]) on the Prometheus
+side. A direct Product.buy records its own revenue; Store.order records
+an order's lines only once all of them went through, so an order that is
+rolled back adds nothing (its buy() calls run inside deferred_sales()).
+
+Counters are kept per thread: each thread only ever writes its own
+dict and list, so recording takes no lock, and render() adds up the
+threads' values. When a thread ends, its counts are folded into a
+shared total and its counters are dropped, so short-lived threads do
+not pile up. As with the instrumentation module, the hot path only
+tests the module flag ENABLED while metrics are off.
+
+serve() starts a small HTTP exporter answering GET /metrics.
+"""
+import threading
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+ENABLED = False
+
+# Upper bounds of the order latency histogram, in seconds
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                   0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class _ThreadCounters:
+    """Counters written by one thread only."""
+    __slots__ = ('values', 'buckets', 'deferring', '__weakref__')
+
+    def __init__(self):
+        # (series, label value) -> count; the latency sum lives here too
+        self.values: Dict[Tuple[str, str], Any] = {}
+        # Order latency histogram, not cumulative; the last slot is +Inf
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        # Nesting depth of deferred_sales(); record_sale does nothing while > 0
+        self.deferring = 0
+
+class _ThreadOwner:
+    """Lives only in its thread's local storage, so it is freed when the thread ends."""
+    __slots__ = ('__weakref__',)
+
+_local = threading.local()
+_all_counters: List[_ThreadCounters] = []
+# Counts of the threads that ended, folded in by _retire
+_retired = _ThreadCounters()
+_all_counters_lock = threading.Lock()
+# Watched stores and the label each is exported under
+_stores: 'weakref.WeakKeyDictionary[Any, str]' = weakref.WeakKeyDictionary()
+
+def _counters() -> _ThreadCounters:
+    """Returns the calling thread's counters, creating them on first use."""
+    try:
+        return _local.counters
+    except AttributeError:
+        counters = _local.counters = _ThreadCounters()
+        owner = _local.owner = _ThreadOwner()
+        weakref.finalize(owner, _retire, counters)
+        with _all_counters_lock:
+            _all_counters.append(counters)
+        return counters
+
+def _retire(counters: _ThreadCounters):
+    """Folds the counters of a thread that ended into _retired and forgets them."""
+    with _all_counters_lock:
+        values = _retired.values
+        for key, amount in counters.values.items():
+            values[key] = values.get(key, 0) + amount
+        for index, count in enumerate(counters.buckets):
+            _retired.buckets[index] += count
+        _all_counters.remove(counters)
+
+def _add(series: str, label: str, amount=1):
+    values = _counters().values
+    key = (series, label)
+    values[key] = values.get(key, 0) + amount
+
+# --- Switching on and off ---
+def enable():
+    """Starts recording orders and purchases."""
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    """Stops recording; the values recorded so far are kept."""
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    """Zeroes every counter. Meant for tests; not safe while other threads record."""
+    with _all_counters_lock:
+        for counters in _all_counters + [_retired]:
+            counters.values.clear()
+            counters.buckets[:] = [0] * len(counters.buckets)
+
+def watch(store_instance, name: str = "default"):
+    """Exports the stock levels of a store under the given store label."""
+    _stores[store_instance] = name
+
+# --- Recording ---
+def failure_reason(error: Exception) -> str:
+    """Classifies a rejected order by the type of its error."""
+    # Imported here: products and store import this module themselves
+    import products
+    import store
+    if isinstance(error, store.OrderError):
+        error = error.cause
+    if isinstance(error, products.OutOfStock):
+        return "out_of_stock"
+    if isinstance(error, products.InactiveProduct):
+        return "inactive"
+    if isinstance(error, products.PurchaseLimitExceeded):
+        return "limit_exceeded"
+    if isinstance(error, products.UnknownProduct):
+        return "unknown_product"
+    if isinstance(error, (TypeError, ValueError)):
+        return "invalid"
+    return "other"
+
+def observe_order(order: Callable, shopping_list) -> Any:
+    """Runs order(shopping_list), recording its outcome and latency."""
+    start = perf_counter()
+    try:
+        total = order(shopping_list)
+    except Exception as e:
+        _add("bestbuy_orders_failed_total", failure_reason(e))
+        raise
+    else:
+        error = getattr(total, "error", None) # Set on the OrderResult of raise_errors=False
+        if error is None:
+            _add("bestbuy_orders_total", "")
+        else:
+            _add("bestbuy_orders_failed_total", failure_reason(error))
+        return total
+    finally:
+        elapsed = perf_counter() - start
+        counters = _counters()
+        counters.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        _add("bestbuy_order_latency_seconds_sum", "", elapsed)
+
+def record_sale(product, cents: int):
+    """Adds the price of one purchase, in cents, to its promotion's revenue."""
+    counters = _counters()
+    if counters.deferring:
+        return
+    promotion = product.promotion
+    key = ("bestbuy_revenue_cents_total", promotion.name if promotion is not None else "none")
+    values = counters.values
+    values[key] = values.get(key, 0) + cents
+
+@contextmanager
+def deferred_sales() -> Iterator[None]:
+    """
+    Ignores this thread's record_sale calls for the duration of the block.
+
+    For callers such as Store._commit that buy several lines through
+    Product.buy and record them themselves once every line stands.
+    """
+    counters = _counters()
+    counters.deferring += 1
+    try:
+        yield
+    finally:
+        counters.deferring -= 1
+
+# --- Exposition ---
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render() -> str:
+    """Returns every series in the Prometheus text format (version 0.0.4)."""
+    totals: Dict[Tuple[str, str], Any] = {}
+    buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+    with _all_counters_lock:
+        snapshots = [(dict(counters.values), list(counters.buckets)) for counters in _all_counters + [_retired]]
+    for values, thread_buckets in snapshots:
+        for key, amount in values.items():
+            totals[key] = totals.get(key, 0) + amount
+        for index, count in enumerate(thread_buckets):
+            buckets[index] += count
+
+    lines = ["# HELP bestbuy_orders_total Orders that went through.",
+             "# TYPE bestbuy_orders_total counter",
+             f"bestbuy_orders_total {totals.get(('bestbuy_orders_total', ''), 0)}",
+             "# HELP bestbuy_orders_failed_total Rejected orders by reason.",
+             "# TYPE bestbuy_orders_failed_total counter"]
+    lines += [f'bestbuy_orders_failed_total{{reason="{_label(reason)}"}} {count}'
+              for (series, reason), count in sorted(totals.items()) if series == "bestbuy_orders_failed_total"]
+
+    lines += ["# HELP bestbuy_order_latency_seconds Time spent in Store.order.",
+              "# TYPE bestbuy_order_latency_seconds histogram"]
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, buckets):
+        cumulative += count
+        lines.append(f'bestbuy_order_latency_seconds_bucket{{le="{bound}"}} {cumulative}')
+    cumulative += buckets[-1]
+    lines += [f'bestbuy_order_latency_seconds_bucket{{le="+Inf"}} {cumulative}',
+              f"bestbuy_order_latency_seconds_sum {totals.get(('bestbuy_order_latency_seconds_sum', ''), 0.0)}",
+              f"bestbuy_order_latency_seconds_count {cumulative}"]
+
+    lines += ["# HELP bestbuy_revenue_cents_total Revenue of purchases by promotion, in cents.",
+              "# TYPE bestbuy_revenue_cents_total counter"]
+    lines += [f'bestbuy_revenue_cents_total{{promotion="{_label(promotion)}"}} {cents}'
+              for (series, promotion), cents in sorted(totals.items()) if series == "bestbuy_revenue_cents_total"]
+
+    lines += ["# HELP bestbuy_stock_quantity Current stock of each product.",
+              "# TYPE bestbuy_stock_quantity gauge"]
+    store_totals = []
+    for store_instance, store_name in list(_stores.items()):
+        # A copy: the exporter thread must not walk the catalog while orders change it
+        for product in store_instance.snapshot_products():
+            lines.append(f'bestbuy_stock_quantity{{store="{_label(store_name)}",product="{_label(product.name)}"}} '
+                         f'{product.quantity}')
+        store_totals.append(f'bestbuy_stock_total{{store="{_label(store_name)}"}} '
+                            f'{store_instance.get_total_quantity()}')
+    lines += ["# HELP bestbuy_stock_total Total stock of each store.",
+              "# TYPE bestbuy_stock_total gauge"] + store_totals
+    return "\n".join(lines) + "\n"
+
+# --- HTTP exporter ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes are too frequent to log
+
+def serve(port: int = 9100, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serves /metrics on host:port from a daemon thread; returns the server.
+
+    Call shutdown() and server_close() on the result to stop it. Port 0
+    picks a free port (see server.server_address).
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    return server
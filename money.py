@@ -0,0 +1,173 @@
+# money.py
+import sys
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+from typing import Any, Union
+
+_HASH_MODULUS = sys.hash_info.modulus
+# hash(Fraction(cents, 100)) is cents times this inverse, modulo the hash modulus
+_HASH_INVERSE_100 = pow(100, -1, _HASH_MODULUS)
+_new = object.__new__
+
+class Money:
+    """
+    An exact amount of money stored as an integer number of cents.
+
+    Addition, subtraction and multiplication by an int stay exact; the only
+    rounding happens in scale(), which rounds half up to a whole cent, and
+    in multiplication by a float, Decimal or Fraction, which goes through it.
+    Money compares and hashes equal to the number it represents, so
+    Money.of(1450) == 1450 and Money.of("0.10") != 0.1 (like Decimal).
+    Comparisons with a float use the float's exact binary value, which for
+    most decimal prices is not the amount written: Money.of(19.99) == 19.99
+    is False. Compare with Money.of(19.99) or Money.of("19.99") instead.
+
+    Totals on the order path are added up as int cents; Money is made of
+    the result only, since building one object per line costs far more
+    than the int arithmetic.
+    """
+    __slots__ = ('cents',)
+
+    def __init__(self, cents: int):
+        """Creates an amount from a whole number of cents."""
+        if not isinstance(cents, int):
+            raise TypeError("Money needs a whole number of cents.")
+        self.cents = cents
+
+    @classmethod
+    def of(cls, value: Union['Money', int, float, Decimal, str]) -> 'Money':
+        """Converts an amount in currency units (e.g. 19.99) to Money, rounding half up."""
+        if isinstance(value, Money):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool):
+            return cls(value * 100)
+        if isinstance(value, (float, str)):
+            # str() of a float is its shortest repr, so 19.99 becomes exactly 19.99
+            value = Decimal(str(value))
+        if isinstance(value, Decimal):
+            if not value.is_finite():
+                raise ValueError("Money amount must be finite.")
+            return cls(int((value * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+        raise TypeError(f"Cannot convert {type(value).__name__} to Money.")
+
+    def scale(self, numerator: int, denominator: int) -> 'Money':
+        """Returns self * numerator / denominator, rounded half up to a whole cent."""
+        product = self.cents * numerator
+        # Round half up (away from zero for negative amounts)
+        if product >= 0:
+            return Money((2 * product + denominator) // (2 * denominator))
+        return Money(-((-2 * product + denominator) // (2 * denominator)))
+
+    # --- Arithmetic ---
+    def __add__(self, other: Any) -> 'Money':
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        if isinstance(other, (int, float, Decimal)):
+            return Money(self.cents + Money.of(other).cents)
+        return NotImplemented
+
+    __radd__ = __add__ # Lets sum() start from 0
+
+    def __sub__(self, other: Any) -> 'Money':
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        if isinstance(other, (int, float, Decimal)):
+            return Money(self.cents - Money.of(other).cents)
+        return NotImplemented
+
+    def __rsub__(self, other: Any) -> 'Money':
+        if isinstance(other, (int, float, Decimal)):
+            return Money(Money.of(other).cents - self.cents)
+        return NotImplemented
+
+    def __mul__(self, other: Any) -> 'Money':
+        if type(other) is int: # The hot case, a quantity; skips the check in __init__
+            result = _new(Money)
+            result.cents = self.cents * other
+            return result
+        if isinstance(other, int) and not isinstance(other, bool):
+            return Money(self.cents * other)
+        if isinstance(other, (float, Decimal, Fraction)):
+            # Fractional factors (e.g. price * quantity * 0.9 in a custom
+            # promotion) are taken exactly, like Money.of takes 19.99, and the
+            # result is rounded once, like scale()
+            if isinstance(other, float):
+                other = Decimal(str(other))
+            if isinstance(other, Decimal):
+                if not other.is_finite():
+                    raise ValueError("Money can only be multiplied by a finite factor.")
+                numerator, denominator = other.as_integer_ratio()
+            else:
+                numerator, denominator = other.numerator, other.denominator
+            return self.scale(numerator, denominator)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> 'Money':
+        return Money(-self.cents)
+
+    # --- Comparison ---
+    def _compare_key(self, other: Any):
+        """Returns (self, other) as values of a common exact type, or None."""
+        if isinstance(other, Money):
+            return self.cents, other.cents
+        if isinstance(other, int):
+            return self.cents, other * 100
+        if isinstance(other, (float, Decimal, Fraction)):
+            if isinstance(other, float) and other != other: # NaN compares unequal to everything
+                return None
+            return Fraction(self.cents, 100), Fraction(other)
+        return None
+
+    def __eq__(self, other: Any) -> bool:
+        keys = self._compare_key(other)
+        return NotImplemented if keys is None else keys[0] == keys[1]
+
+    def __lt__(self, other: Any) -> bool:
+        keys = self._compare_key(other)
+        return NotImplemented if keys is None else keys[0] < keys[1]
+
+    def __le__(self, other: Any) -> bool:
+        keys = self._compare_key(other)
+        return NotImplemented if keys is None else keys[0] <= keys[1]
+
+    def __gt__(self, other: Any) -> bool:
+        keys = self._compare_key(other)
+        return NotImplemented if keys is None else keys[0] > keys[1]
+
+    def __ge__(self, other: Any) -> bool:
+        keys = self._compare_key(other)
+        return NotImplemented if keys is None else keys[0] >= keys[1]
+
+    def __hash__(self) -> int:
+        # Must match the hash of the equal int/Fraction/Decimal; this is
+        # Python's numeric hash of cents/100 without building the Fraction
+        # (prices are hashed on every quote cache lookup)
+        value = abs(self.cents) % _HASH_MODULUS * _HASH_INVERSE_100 % _HASH_MODULUS
+        if self.cents < 0:
+            value = -value
+        return -2 if value == -1 else value
+
+    def __bool__(self) -> bool:
+        return self.cents != 0
+
+    # --- Conversion ---
+    def to_decimal(self) -> Decimal:
+        """Returns the amount as a Decimal with two places."""
+        return Decimal(self.cents).scaleb(-2)
+
+    def __float__(self) -> float:
+        return self.cents / 100
+
+    def __str__(self) -> str:
+        return str(self.to_decimal())
+
+    def __repr__(self) -> str:
+        return f"Money('{self}')"
+
+    def __format__(self, spec: str) -> str:
+        """Supports the usual numeric format specs, e.g. f'{total:.2f}'."""
+        return format(self.to_decimal(), spec)
+
+ZERO = Money(0)
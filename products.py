@@ -1,34 +1,109 @@
 # products.py
+import threading
+import instrumentation
+import metrics
 import promotions
-from typing import Optional, Any # Added Any for comparison type hint
+from money import Money
+from typing import Dict, Optional, Any # Added Any for comparison type hint
+
+# Serializes the lazy creation of per-product locks
+_LOCK_INIT = threading.Lock()
+
+# --- Purchase errors ---
+# The fields are the exception's args, in the order given in each class
+# docstring: BaseException's own __init__ stores them (cheaper than a
+# Python-level __init__), they survive pickling, and the message is only
+# formatted when the error is printed.
+
+class PurchaseError(Exception):
+    """Base class of the reasons a product cannot be bought."""
+    @property
+    def product_name(self) -> str:
+        """Gets the name of the product that could not be bought."""
+        return self.args[0]
+
+class InactiveProduct(PurchaseError):
+    """The product has no stock and is inactive. Args: product_name."""
+    def __str__(self) -> str:
+        return f"Cannot buy '{self.product_name}', product is inactive."
+
+class OutOfStock(PurchaseError):
+    """Fewer items are in stock than were requested. Args: product_name, requested, available."""
+    @property
+    def requested(self) -> int:
+        return self.args[1]
+
+    @property
+    def available(self) -> int:
+        return self.args[2]
+
+    def __str__(self) -> str:
+        return f"Not enough stock for '{self.product_name}'. Available: {self.available}, Requested: {self.requested}"
+
+class PurchaseLimitExceeded(PurchaseError):
+    """More items were requested than a LimitedProduct allows per purchase. Args: product_name, requested, maximum."""
+    @property
+    def requested(self) -> int:
+        return self.args[1]
+
+    @property
+    def maximum(self) -> int:
+        return self.args[2]
+
+    def __str__(self) -> str:
+        return f"Cannot buy {self.requested} of '{self.product_name}'. Maximum allowed is {self.maximum}."
+
+class UnknownProduct(PurchaseError):
+    """The product is not part of the store the order was sent to. Args: product_name."""
+    def __str__(self) -> str:
+        return "product is not in this store."
 
 class Product:
     """
     Represents a product using properties and magic methods.
+
+    The hierarchy uses __slots__, so instances carry no per-instance
+    __dict__; subclasses must declare __slots__ too to stay compact.
     """
+    __slots__ = ('name', '_price', '_quantity', '_active', '_promotion', '_stores', '_lock', '__weakref__')
 
     def __init__(self, name: str, price: float, quantity: int):
         """Initializes a Product instance."""
         if not name:
             raise ValueError("Product name cannot be empty.")
+        # Stores holding this product; notified whenever the quantity changes.
+        # A tuple, so products outside any store share the empty one.
+        self._stores: tuple = ()
+        # Created on first use by the lock property
+        self._lock: Optional[threading.RLock] = None
+        self._quantity = 0
+        self._active = False
+        self._promotion: Optional[promotions.Promotion] = None # Internal storage for promotion
         # Use setters for initial validation and setup
         self.name = name # Keep name as a direct attribute for simplicity
         self.price = price
         self.quantity = quantity # This will also set initial active status via the setter
-        self._promotion: Optional[promotions.Promotion] = None # Internal storage for promotion
 
     # --- Price Property ---
     @property
-    def price(self) -> float:
-        """Gets the product price."""
+    def price(self) -> Money:
+        """
+        Gets the product price as exact Money.
+
+        Money compares with floats exactly, so Product("A", 19.99, 1).price
+        == 19.99 is False; compare with Money.of(19.99) instead.
+        """
         return self._price
 
     @price.setter
     def price(self, value: float):
-        """Sets the product price, ensuring its non-negative.""" # Corrected: it's -> its
+        """Sets the product price (any number or Money), ensuring its non-negative.""" # Corrected: it's -> its
+        value = Money.of(value)
         if value < 0:
             raise ValueError("Product price cannot be negative.")
         self._price = value
+        if self._promotion is not None:
+            promotions.quote_cache.invalidate(self._promotion)
 
     # --- Quantity Property (also manages active status) ---
     @property
@@ -41,9 +116,31 @@ class Product:
         """Sets the product quantity and updates active status accordingly."""
         if value < 0:
             raise ValueError("Quantity cannot be negative.")
+        delta = value - self._quantity
+        was_active = self._active
         self._quantity = value
         # Automatically update active status based on quantity
         self._active = (self._quantity > 0)
+        # Keep the totals and active sets of every store holding this product in sync
+        for store in self._stores:
+            store._on_quantity_change(self, delta, was_active != self._active)
+
+    # --- Lock Property (Read-Only) ---
+    @property
+    def lock(self) -> threading.RLock:
+        """
+        Gets the per-product lock used to serialize purchases.
+
+        It guards the check-then-decrement in buy() and is re-entrant so a
+        Store can hold it across a whole order while buy() takes it again.
+        """
+        lock = self._lock
+        if lock is None:
+            with _LOCK_INIT:
+                if self._lock is None:
+                    self._lock = threading.RLock()
+                lock = self._lock
+        return lock
 
     # --- Active Property (Read-Only) ---
     @property
@@ -63,8 +160,20 @@ class Product:
         """Sets or removes the promotion."""
         if value is not None and not isinstance(value, promotions.Promotion):
             raise TypeError("Invalid promotion type provided.")
+        for promotion in (self._promotion, value):
+            if promotion is not None:
+                promotions.quote_cache.invalidate(promotion)
         self._promotion = value
 
+    # --- Serialization ---
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the product as a JSON-compatible dict (price as an exact decimal string)."""
+        return {"type": "Product",
+                "name": self.name,
+                "price": str(self.price),
+                "quantity": self.quantity,
+                "promotion": self.promotion.to_dict() if self.promotion else None}
+
     # --- Magic Methods ---
     def __str__(self) -> str:
         """Returns a user-friendly string representation."""
@@ -85,35 +194,95 @@ class Product:
             return NotImplemented
         return self.price > other.price
 
-    # --- Buy Method (uses properties internally) ---
-    def buy(self, quantity: int) -> float:
-        """Processes purchase, applying promotions if available."""
+    # --- Purchase checks (shared by buy and Store.order) ---
+    def validate_purchase(self, quantity: int):
+        """Checks the requested quantity itself, independent of current stock."""
+        error = self.purchase_error(quantity)
+        if error is not None:
+            raise error
+
+    def purchase_error(self, quantity: int) -> Optional[Exception]:
+        """Returns the error validate_purchase would raise, or None, without raising it."""
         if quantity <= 0:
-            raise ValueError("Quantity to buy must be positive.")
+            return ValueError("Quantity to buy must be positive.")
+        return None
 
-        # Use the 'active' property for the check
-        if not self.active:
-             raise Exception(f"Cannot buy '{self.name}', product is inactive.")
+    def check_stock(self, quantity: int, available: Optional[int] = None):
+        """Checks that quantity can be taken from stock (default: current quantity)."""
+        error = self.stock_error(quantity, available)
+        if error is not None:
+            raise error
+
+    def stock_error(self, quantity: int, available: Optional[int] = None) -> Optional[PurchaseError]:
+        """Returns the error check_stock would raise, or None, without raising it."""
+        if available is None:
+            # Use the 'active' and 'quantity' properties for the check
+            active, available = self.active, self.quantity
+        else:
+            active = available > 0
+        if not active:
+            return InactiveProduct(self.name)
+        if available < quantity:
+            return OutOfStock(self.name, quantity, available)
+        return None
 
-        # Use the 'quantity' property for the check
-        if self.quantity < quantity:
-            raise Exception(f"Not enough stock for '{self.name}'. Available: {self.quantity}, Requested: {quantity}")
+    def _cents_for(self, quantity: int) -> int:
+        """
+        Returns the total price for quantity in cents, applying the promotion if any.
 
-        # Calculate price using promotion property
+        Order paths add these up as ints and make Money of the total only.
+        """
         if self.promotion:
-            total_price = self.promotion.apply_promotion(self, quantity)
-        else:
-            total_price = self.price * quantity # Use price property
+            return promotions.quote_cache.cents(self.promotion, self, quantity)
+        return self._price.cents * quantity
+
+    def quote(self, quantity: int) -> Money:
+        """Returns what buying quantity would cost right now, without buying it."""
+        self.validate_purchase(quantity)
+        self.check_stock(quantity)
+        return Money(self._cents_for(quantity))
+
+    # --- Buy Method (uses properties internally) ---
+    def buy(self, quantity: int) -> Money:
+        """Processes purchase, applying promotions if available."""
+        if instrumentation.ENABLED:
+            return self._buy_instrumented(quantity)
+        self.validate_purchase(quantity)
+        with self.lock:
+            self.check_stock(quantity)
+
+            # Calculate price using promotion property
+            total_cents = self._cents_for(quantity)
+
+            # Update quantity using the property setter (which also updates active status)
+            self.quantity -= quantity
 
-        # Update quantity using the property setter (which also updates active status)
-        self.quantity -= quantity
+        if metrics.ENABLED:
+            metrics.record_sale(self, total_cents)
+        return Money(total_cents)
 
-        return total_price
+    def _buy_instrumented(self, quantity: int) -> Money:
+        """buy() with every stage timed in instrumentation.registry."""
+        stage = instrumentation.stage
+        with stage("validation"):
+            self.validate_purchase(quantity)
+        with self.lock:
+            with stage("stock_check"):
+                self.check_stock(quantity)
+            with stage("promotion_pricing"):
+                total_cents = self._cents_for(quantity)
+            with stage("decrement"):
+                self.quantity -= quantity
+        if metrics.ENABLED:
+            metrics.record_sale(self, total_cents)
+        return Money(total_cents)
 
 # --- Inherited Classes (Updated to use properties and __str__) ---
 
 class NonStockedProduct(Product):
     """Non-stocked product using properties."""
+    __slots__ = ()
+
     def __init__(self, name: str, price: float):
         # Initialize with quantity 0, price setter handles validation
         super().__init__(name, price, 0)
@@ -135,17 +304,41 @@ class NonStockedProduct(Product):
     def active(self) -> bool:
         return True
 
-    def buy(self, quantity: int) -> float:
+    def check_stock(self, quantity: int, available: Optional[int] = None):
+        """Non-stocked products can always be 'bought'."""
+        pass
+
+    def stock_error(self, quantity: int, available: Optional[int] = None) -> Optional[PurchaseError]:
+        """Non-stocked products never run out."""
+        return None
+
+    def buy(self, quantity: int) -> Money:
         """Processes 'purchase', applies promotion."""
-        if quantity <= 0:
-            raise ValueError("Quantity to buy must be positive.")
-        # Calculate price using promotion property
-        if self.promotion:
-            total_price = self.promotion.apply_promotion(self, quantity)
-        else:
-            total_price = self.price * quantity # Use price property
+        if instrumentation.ENABLED:
+            return self._buy_instrumented(quantity)
+        self.validate_purchase(quantity)
         # No quantity update
-        return total_price
+        total_cents = self._cents_for(quantity)
+        if metrics.ENABLED:
+            metrics.record_sale(self, total_cents)
+        return Money(total_cents)
+
+    def _buy_instrumented(self, quantity: int) -> Money:
+        """buy() with every stage timed in instrumentation.registry."""
+        with instrumentation.stage("validation"):
+            self.validate_purchase(quantity)
+        with instrumentation.stage("promotion_pricing"):
+            total_cents = self._cents_for(quantity)
+        if metrics.ENABLED:
+            metrics.record_sale(self, total_cents)
+        return Money(total_cents)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the product as a JSON-compatible dict, without a quantity."""
+        data = super().to_dict()
+        data["type"] = "NonStockedProduct"
+        del data["quantity"]
+        return data
 
     def __str__(self) -> str:
         """String representation for non-stocked product."""
@@ -156,20 +349,27 @@ class NonStockedProduct(Product):
 
 class LimitedProduct(Product):
     """Limited product using properties."""
+    __slots__ = ('maximum',)
+
     def __init__(self, name: str, price: float, quantity: int, maximum: int):
         super().__init__(name, price, quantity)
         if maximum <= 0:
             raise ValueError("Maximum purchase quantity must be positive.")
         self.maximum = maximum # Keep maximum as a direct attribute
 
-    def buy(self, quantity: int) -> float:
-        """Processes purchase, checking limit first."""
-        if quantity <= 0:
-            raise ValueError("Quantity to buy must be positive.")
-        if quantity > self.maximum:
-            raise Exception(f"Cannot buy {quantity} of '{self.name}'. Maximum allowed is {self.maximum}.")
-        # Call parent buy method (which uses properties and handles promotions)
-        return super().buy(quantity)
+    def purchase_error(self, quantity: int) -> Optional[Exception]:
+        """Checks the quantity against the per-purchase limit as well."""
+        error = super().purchase_error(quantity)
+        if error is None and quantity > self.maximum:
+            return PurchaseLimitExceeded(self.name, quantity, self.maximum)
+        return error
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the product as a JSON-compatible dict, including the limit."""
+        data = super().to_dict()
+        data["type"] = "LimitedProduct"
+        data["maximum"] = self.maximum
+        return data
 
     def __str__(self) -> str:
         """String representation including limit and promotion."""
@@ -185,3 +385,43 @@ class LimitedProduct(Product):
         # Add limit info and re-append promo info
         return f"{base_info} (Max per purchase: {self.maximum}){promo_part}"
 
+
+# --- Deserialization ---
+
+def _restore(product_class: type, name: str, price: Money, quantity: int,
+             promotion: Optional[promotions.Promotion] = None, maximum: int = 0) -> Product:
+    """
+    Rebuilds a product from trusted, already validated values (e.g. a snapshot).
+
+    Skips __init__ and the property setters, so nothing is checked.
+    """
+    product = product_class.__new__(product_class)
+    product._stores = ()
+    product._lock = None
+    product.name = name
+    product._price = price
+    product._promotion = promotion
+    if issubclass(product_class, NonStockedProduct):
+        product._quantity = 0
+        product._active = True
+    else:
+        product._quantity = quantity
+        product._active = quantity > 0
+    if issubclass(product_class, LimitedProduct):
+        product.maximum = maximum
+    return product
+
+def from_dict(data: Dict[str, Any]) -> Product:
+    """Rebuilds a product (and its promotion) from the dict produced by to_dict."""
+    product_type = data.get("type", "Product")
+    if product_type == "NonStockedProduct":
+        product = NonStockedProduct(data["name"], data["price"])
+    elif product_type == "LimitedProduct":
+        product = LimitedProduct(data["name"], data["price"], data["quantity"], data["maximum"])
+    elif product_type == "Product":
+        product = Product(data["name"], data["price"], data["quantity"])
+    else:
+        raise ValueError(f"Unknown product type: {product_type!r}")
+    if data.get("promotion"):
+        product.promotion = promotions.from_dict(data["promotion"])
+    return product
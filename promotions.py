@@ -1,10 +1,55 @@
 # promotions.py
+import threading
+import weakref
 from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from decimal import Decimal
+from fractions import Fraction
+from money import Money
 # Use forward reference for type hint to avoid circular import if Product needs Promotion
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Dict, Sequence, Set, Tuple, Type
 if TYPE_CHECKING:
     import products
 
+# NumPy is optional: batch pricing uses it when installed and falls back to
+# plain Python loops over the stdlib array module otherwise.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class _PricedItem:
+    """Minimal stand-in for a product, used when pricing by price alone."""
+    __slots__ = ('price',)
+
+    def __init__(self, price: Money):
+        self.price = price
+
+def _as_columns(prices: Sequence[int], quantities: Sequence[int]):
+    """Checks batch inputs and converts them to NumPy arrays when NumPy is available."""
+    if len(prices) != len(quantities):
+        raise ValueError("Prices and quantities must have the same length.")
+    if numpy is not None:
+        return numpy.asarray(prices, dtype=numpy.int64), numpy.asarray(quantities, dtype=numpy.int64)
+    return prices, quantities
+
+def _scale_column(amounts, numerator: int, denominator: int):
+    """NumPy version of Money.scale for non-negative cents: amounts * n / d, rounded half up."""
+    return (2 * numerator * amounts + denominator) // (2 * denominator)
+
+# Promotion classes by name, filled in by Promotion.__init_subclass__
+PROMOTION_TYPES: Dict[str, Type['Promotion']] = {}
+
+def from_dict(data: Dict[str, Any]) -> 'Promotion':
+    """Rebuilds a promotion from the dict produced by Promotion.to_dict."""
+    arguments = dict(data)
+    type_name = arguments.pop("type", None)
+    promotion_class = PROMOTION_TYPES.get(type_name)
+    if promotion_class is None:
+        raise ValueError(f"Unknown promotion type: {type_name!r}")
+    return promotion_class(**arguments)
+
 class Promotion(ABC):
     """
     Abstract base class for all promotions.
@@ -14,8 +59,31 @@ class Promotion(ABC):
             raise ValueError("Promotion name cannot be empty.")
         self.name = name
 
+    def __init_subclass__(cls, **kwargs):
+        """Registers every concrete promotion class so from_dict can rebuild it."""
+        super().__init_subclass__(**kwargs)
+        PROMOTION_TYPES[cls.__name__] = cls
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the promotion as a JSON-compatible dict.
+
+        The keys other than 'type' must match the constructor's arguments;
+        subclasses with extra settings add them here.
+        """
+        return {"type": type(self).__name__, "name": self.name}
+
+    def invalidate(self):
+        """
+        Drops the cached prices of this promotion.
+
+        Subclasses with settings of their own call this from their setters,
+        so a promotion changed in place reprices every product using it.
+        """
+        quote_cache.invalidate(self)
+
     @abstractmethod
-    def apply_promotion(self, product: 'products.Product', quantity: int) -> float:
+    def apply_promotion(self, product: 'products.Product', quantity: int) -> Money:
         """
         Applies the promotion to a given product and quantity.
 
@@ -25,42 +93,105 @@ class Promotion(ABC):
             quantity (int): The quantity of the product being purchased.
 
         Returns:
-            float: The total discounted price for the given quantity.
+            Money: The total discounted price for the given quantity,
+                   rounded half up to a whole cent.
         """
         pass
 
+    def apply_promotion_batch(self, prices: Sequence[int], quantities: Sequence[int]) -> Sequence[int]:
+        """
+        Prices many (price, quantity) pairs at once.
+
+        Args:
+            prices: Unit prices in integer cents, one per pair.
+            quantities: Quantities, one per pair.
+
+        Returns:
+            The total in integer cents for each pair: a NumPy array if
+            NumPy is installed, otherwise an array('q').
+
+        This generic version calls apply_promotion once per pair with a
+        stand-in product that only has a price, so custom promotions work
+        without changes as long as they only look at product.price. The
+        built-in promotions override it with a vectorized version.
+        """
+        prices, quantities = _as_columns(prices, quantities)
+        item = _PricedItem(Money(0))
+        totals = array('q')
+        for price, quantity in zip(prices, quantities):
+            item.price = Money(int(price))
+            totals.append(Money.of(self.apply_promotion(item, int(quantity))).cents)
+        return numpy.asarray(totals) if numpy is not None else totals
+
 class PercentDiscount(Promotion):
     """Applies a percentage discount to the total price."""
     def __init__(self, name: str, percent: float):
         super().__init__(name)
-        if not 0 <= percent <= 100:
-            raise ValueError("Percentage must be between 0 and 100.")
         self.percent = percent
 
-    def apply_promotion(self, product: 'products.Product', quantity: int) -> float:
+    @property
+    def percent(self) -> float:
+        """Gets the discount percentage."""
+        return self._percent
+
+    @percent.setter
+    def percent(self, value: float):
+        """Sets the discount percentage and the exact fraction of the price that is kept."""
+        if not 0 <= value <= 100:
+            raise ValueError("Percentage must be between 0 and 100.")
+        self._percent = value
+        # e.g. 30 -> 7/10; str() keeps float percentages like 12.5 exact
+        self._kept = 1 - Fraction(Decimal(str(value))) / 100
+        self.invalidate()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the promotion as a JSON-compatible dict, including the percentage."""
+        data = super().to_dict()
+        data["percent"] = self.percent
+        return data
+
+    def apply_promotion(self, product: 'products.Product', quantity: int) -> Money:
         """Calculates the price after applying the percentage discount."""
-        discount_multiplier = 1 - (self.percent / 100)
-        total_price = product.price * quantity * discount_multiplier
+        total_price = (product.price * quantity).scale(self._kept.numerator, self._kept.denominator)
         return total_price
 
+    def apply_promotion_batch(self, prices: Sequence[int], quantities: Sequence[int]) -> Sequence[int]:
+        """Vectorized apply_promotion over many (price, quantity) pairs, in cents."""
+        prices, quantities = _as_columns(prices, quantities)
+        numerator, denominator = self._kept.numerator, self._kept.denominator
+        if numpy is not None:
+            return _scale_column(prices * quantities, numerator, denominator)
+        # Same rounding as _scale_column, fused into one pass
+        double_numerator, double_denominator = 2 * numerator, 2 * denominator
+        return array('q', [(double_numerator * price * quantity + denominator) // double_denominator
+                           for price, quantity in zip(prices, quantities)])
+
 class SecondHalfPrice(Promotion):
     """Second item purchased is half price."""
     def __init__(self, name: str):
         super().__init__(name)
 
-    def apply_promotion(self, product: 'products.Product', quantity: int) -> float:
+    def apply_promotion(self, product: 'products.Product', quantity: int) -> Money:
         """Calculates the price where every second item is half price."""
         full_price_items = (quantity + 1) // 2  # Integer division rounds down
         half_price_items = quantity // 2
-        total_price = (full_price_items * product.price) + (half_price_items * product.price * 0.5)
+        total_price = (full_price_items * product.price) + (half_price_items * product.price).scale(1, 2)
         return total_price
 
+    def apply_promotion_batch(self, prices: Sequence[int], quantities: Sequence[int]) -> Sequence[int]:
+        """Vectorized apply_promotion over many (price, quantity) pairs, in cents."""
+        prices, quantities = _as_columns(prices, quantities)
+        if numpy is not None:
+            return ((quantities + 1) // 2) * prices + _scale_column((quantities // 2) * prices, 1, 2)
+        return array('q', [((quantity + 1) // 2) * price + ((quantity // 2) * price + 1) // 2
+                           for price, quantity in zip(prices, quantities)])
+
 class ThirdOneFree(Promotion):
     """Third item purchased is free (buy 2, get 1 free)."""
     def __init__(self, name: str):
         super().__init__(name)
 
-    def apply_promotion(self, product: 'products.Product', quantity: int) -> float:
+    def apply_promotion(self, product: 'products.Product', quantity: int) -> Money:
         """Calculates the price where every third item is free."""
         # Number of free items
         free_items = quantity // 3
@@ -68,3 +199,84 @@ class ThirdOneFree(Promotion):
         paid_items = quantity - free_items
         total_price = paid_items * product.price
         return total_price
+
+    def apply_promotion_batch(self, prices: Sequence[int], quantities: Sequence[int]) -> Sequence[int]:
+        """Vectorized apply_promotion over many (price, quantity) pairs, in cents."""
+        prices, quantities = _as_columns(prices, quantities)
+        if numpy is not None:
+            return (quantities - quantities // 3) * prices
+        return array('q', [(quantity - quantity // 3) * price
+                           for price, quantity in zip(prices, quantities)])
+
+class QuoteCache:
+    """
+    LRU cache of promotion prices keyed by (promotion, price, quantity).
+
+    Prices and cached totals are integer cents, so a lookup hashes plain
+    ints rather than Money.
+
+    Products use it for every promoted line they price, so repeated quotes
+    and purchases of the same cart skip apply_promotion. Entries of a
+    promotion are dropped whenever a product's price or promotion is set
+    while that promotion is involved, and whenever the promotion's own
+    settings change (Promotion.invalidate, called by setters such as
+    PercentDiscount.percent).
+
+    Prices are computed outside the lock. Each invalidation bumps the
+    promotion's generation, and a price whose promotion was invalidated
+    while it was being computed is returned but not stored.
+    """
+    def __init__(self, maxsize: int = 4096):
+        if maxsize <= 0:
+            raise ValueError("Cache size must be positive.")
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Tuple[Promotion, int, int], int]' = OrderedDict()
+        self._keys_by_promotion: Dict[Promotion, Set[Tuple[Promotion, int, int]]] = {}
+        # Invalidation count per promotion, and of clear() for all of them
+        self._generations: 'weakref.WeakKeyDictionary[Promotion, int]' = weakref.WeakKeyDictionary()
+        self._clears = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cents(self, promotion: Promotion, product: 'products.Product', quantity: int) -> int:
+        """Returns promotion.apply_promotion(product, quantity) in cents, from the cache if possible."""
+        key = (promotion, product.price.cents, quantity)
+        with self._lock:
+            total = self._entries.get(key)
+            if total is not None:
+                self._entries.move_to_end(key)
+                return total
+            generation = (self._generations.get(promotion, 0), self._clears)
+        # Computed outside the lock; a concurrent miss just computes it twice
+        total = Money.of(promotion.apply_promotion(product, quantity)).cents
+        with self._lock:
+            if (self._generations.get(promotion, 0), self._clears) != generation:
+                return total # Invalidated meanwhile, so total may be stale
+            self._entries[key] = total
+            self._keys_by_promotion.setdefault(promotion, set()).add(key)
+            if len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                old_keys = self._keys_by_promotion[old_key[0]]
+                old_keys.discard(old_key)
+                if not old_keys:
+                    del self._keys_by_promotion[old_key[0]]
+        return total
+
+    def invalidate(self, promotion: Promotion):
+        """Drops every cached price of the given promotion."""
+        with self._lock:
+            self._generations[promotion] = self._generations.get(promotion, 0) + 1
+            for key in self._keys_by_promotion.pop(promotion, ()):
+                del self._entries[key]
+
+    def clear(self):
+        """Drops every cached price."""
+        with self._lock:
+            self._clears += 1
+            self._entries.clear()
+            self._keys_by_promotion.clear()
+
+# Shared by all products
+quote_cache = QuoteCache()
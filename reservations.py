@@ -0,0 +1,77 @@
+# reservations.py
+import heapq
+import itertools
+import time
+import products
+from typing import Callable, List, Optional, Tuple
+
+HELD = "held"
+ORDERED = "ordered"
+RELEASED = "released"
+EXPIRED = "expired"
+
+class ReservationError(Exception):
+    """Raised when a reservation is used after it was ordered, released or expired."""
+
+class Reservation:
+    """
+    Stock held for a cart until expires_at (on the book's clock).
+
+    Created by Store.reserve and consumed by Store.order(reservation);
+    the held quantities are out of stock for everyone else meanwhile.
+    """
+    __slots__ = ('store', 'lines', 'expires_at', 'state')
+
+    def __init__(self, store_instance, lines: List[Tuple[products.Product, int]], expires_at: float):
+        self.store = store_instance
+        self.lines = lines
+        self.expires_at = expires_at
+        self.state = HELD
+
+    @property
+    def held(self) -> bool:
+        """True until the reservation is ordered, released or expired."""
+        return self.state == HELD
+
+    def __repr__(self) -> str:
+        return f"Reservation({len(self.lines)} lines, {self.state}, expires_at={self.expires_at:.3f})"
+
+class ReservationBook:
+    """
+    Expiry queue of a store's reservations: a heap ordered by expiry time.
+
+    Adding a reservation and expiring one are O(log n). Ordered, released
+    and renewed reservations are not searched for in the heap; their old
+    entries are skipped when they reach the top. Not thread safe by
+    itself, the store serializes access with its own lock.
+    """
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Reservation]] = []
+        self._sequence = itertools.count() # Tie-breaker, reservations do not compare
+
+    def __len__(self) -> int:
+        """Returns the number of heap entries, including ones that are no longer held."""
+        return len(self._heap)
+
+    def push(self, reservation: Reservation):
+        """Schedules a reservation to expire at its expires_at."""
+        heapq.heappush(self._heap, (reservation.expires_at, next(self._sequence), reservation))
+
+    def next_expiry(self) -> Optional[float]:
+        """Returns the time of the earliest heap entry, or None if there is none."""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_expired(self, now: Optional[float] = None) -> List[Reservation]:
+        """Marks every held reservation due by now as expired and returns them."""
+        if now is None:
+            now = self.clock()
+        heap = self._heap
+        expired = []
+        while heap and heap[0][0] <= now:
+            expires_at, _, reservation = heapq.heappop(heap)
+            # Skip entries of reservations that were consumed or renewed since
+            if reservation.state == HELD and reservation.expires_at == expires_at:
+                reservation.state = EXPIRED
+                expired.append(reservation)
+        return expired
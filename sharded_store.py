@@ -0,0 +1,361 @@
+# sharded_store.py
+import itertools
+import multiprocessing
+import os
+import threading
+import zlib
+import products
+import store
+from money import Money, ZERO
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+ProductRef = Union[products.Product, str]
+
+def shard_of(name: str, shard_count: int) -> int:
+    """Returns the shard owning a product name; stable across processes and runs."""
+    # hash() of a str is salted per process, so it cannot be used here
+    return zlib.crc32(name.encode('utf-8')) % shard_count
+
+class _Shard:
+    """The part of the catalog owned by one worker process, in a plain store.Store."""
+    def __init__(self):
+        self.store = store.Store([])
+        # Transaction id -> resolved lines of a prepared (bought, not yet committed) order
+        self.prepared: Dict[int, List[Tuple[products.Product, int]]] = {}
+
+    def resolve(self, lines: List[Tuple[str, Any]]) -> List[Tuple[products.Product, Any]]:
+        """Turns (name, quantity) lines into (product, quantity) lines."""
+        shopping_list = []
+        for name, quantity in lines:
+            product = self.store.get_product(name)
+            if product is None:
+                raise store.OrderError(name, products.UnknownProduct(name))
+            shopping_list.append((product, quantity))
+        return shopping_list
+
+    def add(self, records: List[Dict[str, Any]]) -> int:
+        self.store.add_products([products.from_dict(record) for record in records])
+        return len(records)
+
+    def remove(self, name: str):
+        product = self.store.get_product(name)
+        if product is None:
+            raise ValueError(f"Product '{name}' not found.")
+        self.store.remove_product(product)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        product = self.store.get_product(name)
+        return None if product is None else product.to_dict()
+
+    def active(self) -> List[Dict[str, Any]]:
+        return [product.to_dict() for product in self.store.get_all_products()]
+
+    def total(self) -> int:
+        return self.store.get_total_quantity()
+
+    def count(self) -> int:
+        return len(self.store)
+
+    def order(self, lines: List[Tuple[str, Any]]) -> int:
+        return self.store.order(self.resolve(lines)).cents
+
+    def order_batch(self, orders: List[List[Tuple[str, Any]]]) -> List[Tuple[int, Optional[Exception]]]:
+        shopping_lists: List[Any] = []
+        for lines in orders:
+            try:
+                shopping_lists.append(self.resolve(lines))
+            except Exception as e:
+                shopping_lists.append(e)
+        batch = self.store.order_batch([shopping_list for shopping_list in shopping_lists
+                                        if not isinstance(shopping_list, Exception)])
+        batch_results = iter(batch)
+        results = []
+        for shopping_list in shopping_lists:
+            if isinstance(shopping_list, Exception):
+                results.append((0, shopping_list))
+            else:
+                result = next(batch_results)
+                results.append((result.total.cents, result.error))
+        return results
+
+    # --- Two-phase commit for orders spanning several shards ---
+    def prepare(self, transaction: int, lines: List[Tuple[str, Any]]) -> int:
+        """Buys this shard's lines, keeping them so abort() can put the stock back."""
+        shopping_list = self.resolve(lines)
+        total = self.store.order(shopping_list).cents
+        self.prepared[transaction] = shopping_list
+        return total
+
+    def commit(self, transaction: int):
+        self.prepared.pop(transaction, None)
+
+    def abort(self, transaction: int):
+        for product, quantity in self.prepared.pop(transaction, ()):
+            product.quantity += quantity # A no-op for NonStockedProduct
+
+def _serve(connection):
+    """Worker process loop: runs (operation, args) requests against its shard, one at a time."""
+    shard = _Shard()
+    while True:
+        try:
+            operation, args = connection.recv()
+        except EOFError:
+            return
+        if operation == "stop":
+            connection.send(("ok", None))
+            return
+        try:
+            result = getattr(shard, operation)(*args)
+        except Exception as e:
+            connection.send(("error", e))
+        else:
+            connection.send(("ok", result))
+
+class ShardedStore:
+    """
+    Store API spread over worker processes, one shard each.
+
+    Products are partitioned by a stable hash of their name and live only
+    in the owning worker, each in its own store.Store, so orders on
+    different shards run on different cores instead of sharing one GIL.
+    Products cross the process boundary as Product.to_dict() records, not
+    pickled objects: get_product and get_all_products return copies, and
+    order lines may name a product by its name or by any Product with
+    that name.
+
+    An order whose lines all belong to one shard is a single atomic
+    store.Store.order in that worker. An order spanning several shards
+    uses two-phase commit: every involved shard buys its lines (prepare),
+    and only if all of them succeeded are the purchases kept (commit);
+    otherwise the shards that did buy put their stock back (abort). While
+    a multi-shard order is between the phases, other orders see its stock
+    as already taken.
+
+    For throughput, send many orders at once through order_many, which
+    hands each shard its single-shard orders in one message.
+    """
+    def __init__(self, product_list: Optional[List[products.Product]] = None,
+                 shards: Optional[int] = None, start_method: Optional[str] = None):
+        """Starts the worker processes (one per CPU by default) and adds the products."""
+        shards = shards or os.cpu_count() or 1
+        if shards <= 0:
+            raise ValueError("The number of shards must be positive.")
+        context = multiprocessing.get_context(start_method)
+        self._connections = []
+        self._processes = []
+        # One lock per pipe: a request and its reply must not interleave with another thread's
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._transactions = itertools.count()
+        for index in range(shards):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(target=_serve, args=(child_end,), name=f"store-shard-{index}", daemon=True)
+            process.start()
+            child_end.close()
+            self._connections.append(parent_end)
+            self._processes.append(process)
+        if product_list:
+            self.add_products(product_list)
+
+    @property
+    def shard_count(self) -> int:
+        """Gets the number of shards."""
+        return len(self._connections)
+
+    # --- Messaging ---
+    def _call_many(self, requests: Dict[int, Tuple[str, tuple]]) -> Dict[int, Tuple[str, Any]]:
+        """Sends one request to each given shard, then collects the (status, value) replies."""
+        shards = sorted(requests)
+        for shard in shards: # Fixed order, so concurrent callers cannot deadlock
+            self._locks[shard].acquire()
+        try:
+            sent = []
+            try:
+                for shard in shards:
+                    self._connections[shard].send(requests[shard])
+                    sent.append(shard)
+            except BaseException:
+                # Read the replies already owed, or the next caller would get them
+                for shard in sent:
+                    self._connections[shard].recv()
+                raise
+            return {shard: self._connections[shard].recv() for shard in shards}
+        finally:
+            for shard in shards:
+                self._locks[shard].release()
+
+    def _call(self, shard: int, operation: str, *args) -> Any:
+        """Runs one request on one shard, re-raising its error here."""
+        status, value = self._call_many({shard: (operation, args)})[shard]
+        if status == "error":
+            raise value
+        return value
+
+    def _broadcast(self, operation: str, *args) -> List[Any]:
+        """Runs the same request on every shard; returns the results in shard order."""
+        replies = self._call_many({shard: (operation, args) for shard in range(self.shard_count)})
+        results = []
+        for shard in range(self.shard_count):
+            status, value = replies[shard]
+            if status == "error":
+                raise value
+            results.append(value)
+        return results
+
+    def _shard(self, name: str) -> int:
+        return shard_of(name, self.shard_count)
+
+    # --- Adding and removing ---
+    def add_product(self, product: products.Product):
+        """Adds a copy of a product to its shard."""
+        self.add_products([product])
+
+    def add_products(self, product_list: Iterable[products.Product]):
+        """Adds copies of many products, with one message per shard."""
+        records: Dict[int, List[Dict[str, Any]]] = {}
+        for product in product_list:
+            if not isinstance(product, products.Product):
+                raise TypeError("Only Product objects can be added.")
+            records.setdefault(self._shard(product.name), []).append(product.to_dict())
+        for status, value in self._call_many({shard: ("add", (batch,)) for shard, batch in records.items()}).values():
+            if status == "error":
+                raise value
+
+    def remove_product(self, product: ProductRef):
+        """Removes the product with the given name (or the name of the given product)."""
+        name = _name_of(product)
+        self._call(self._shard(name), "remove", name)
+
+    # --- Reading ---
+    def get_product(self, name: str) -> Optional[products.Product]:
+        """Returns a copy of the first product added under the given name, or None."""
+        record = self._call(self._shard(name), "get", name)
+        return None if record is None else products.from_dict(record)
+
+    def get_all_products(self) -> Sequence[products.Product]:
+        """Returns copies of all active products, grouped by shard."""
+        return tuple(products.from_dict(record) for records in self._broadcast("active") for record in records)
+
+    def get_total_quantity(self) -> int:
+        """Returns the total quantity of all stocked items in every shard."""
+        return sum(self._broadcast("total"))
+
+    def __contains__(self, product: ProductRef) -> bool:
+        """Checks if a product with this name exists in the store using 'in' operator."""
+        name = _name_of(product)
+        return self._call(self._shard(name), "get", name) is not None
+
+    def __len__(self) -> int:
+        """Returns the number of products (active or not) in every shard."""
+        return sum(self._broadcast("count"))
+
+    # --- Ordering ---
+    def _split(self, shopping_list: List[Tuple[ProductRef, Any]]) -> Dict[int, List[Tuple[str, Any]]]:
+        """Checks an order's lines and groups them by shard as (name, quantity) pairs, before anything is sent."""
+        if not isinstance(shopping_list, list):
+            raise TypeError("Shopping list must be a list of tuples.")
+        lines: Dict[int, List[Tuple[str, Any]]] = {}
+        for item in shopping_list:
+            if not isinstance(item, tuple) or len(item) != 2:
+                raise ValueError("Each item must be a tuple (Product, quantity).")
+            name = _name_of(item[0])
+            quantity = item[1]
+            if not isinstance(quantity, int) or quantity <= 0:
+                raise ValueError("Quantity must be a positive integer.")
+            lines.setdefault(self._shard(name), []).append((name, item[1]))
+        return lines
+
+    def order(self, shopping_list: List[Tuple[ProductRef, Any]]) -> Money:
+        """Processes an order atomically across shards: either every line is bought or none is."""
+        lines = self._split(shopping_list)
+        if len(lines) == 1:
+            (shard, shard_lines), = lines.items()
+            return Money(self._call(shard, "order", shard_lines))
+        return self._order_across(lines)
+
+    def _order_across(self, lines: Dict[int, List[Tuple[str, Any]]]) -> Money:
+        """Two-phase commit of an order touching several shards."""
+        transaction = next(self._transactions)
+        try:
+            replies = self._call_many({shard: ("prepare", (transaction, shard_lines))
+                                       for shard, shard_lines in lines.items()})
+        except Exception:
+            # Some shards may have prepared; abort is a no-op on the others
+            self._call_many({shard: ("abort", (transaction,)) for shard in lines})
+            raise
+        errors = [value for status, value in replies.values() if status == "error"]
+        decision = "abort" if errors else "commit"
+        self._call_many({shard: (decision, (transaction,)) for shard, (status, _) in replies.items()
+                         if status == "ok"})
+        if errors:
+            raise errors[0]
+        return Money(sum(value for _, value in replies.values()))
+
+    def order_many(self, shopping_lists: List[List[Tuple[ProductRef, Any]]]) -> List[store.OrderResult]:
+        """
+        Processes many orders, reporting each outcome in an OrderResult instead of raising.
+
+        Single-shard orders go to their shards as one order_batch message
+        each and run on all shards in parallel. Orders spanning several
+        shards then follow one by one with two-phase commit.
+        """
+        if not isinstance(shopping_lists, list):
+            raise TypeError("Shopping lists must be a list of shopping lists.")
+        results: List[Optional[store.OrderResult]] = [None] * len(shopping_lists)
+        batches: Dict[int, List[Tuple[int, List[Tuple[str, Any]]]]] = {}
+        spanning = []
+        for position, shopping_list in enumerate(shopping_lists):
+            try:
+                lines = self._split(shopping_list)
+            except Exception as e:
+                results[position] = store.OrderResult(ZERO, e)
+                continue
+            if len(lines) == 1:
+                (shard, shard_lines), = lines.items()
+                batches.setdefault(shard, []).append((position, shard_lines))
+            else:
+                spanning.append((position, lines))
+
+        replies = self._call_many({shard: ("order_batch", ([shard_lines for _, shard_lines in batch],))
+                                   for shard, batch in batches.items()})
+        for shard, (status, value) in replies.items():
+            if status == "error":
+                raise value
+            for (position, _), (cents, error) in zip(batches[shard], value):
+                results[position] = store.OrderResult(Money(cents), error)
+
+        for position, lines in spanning:
+            try:
+                results[position] = store.OrderResult(self._order_across(lines))
+            except Exception as e:
+                results[position] = store.OrderResult(ZERO, e)
+        return results
+
+    # --- Shutdown ---
+    def close(self):
+        """Stops the worker processes; the shards' contents are discarded."""
+        for shard, connection in enumerate(self._connections):
+            if connection.closed:
+                continue
+            with self._locks[shard]:
+                try:
+                    connection.send(("stop", ()))
+                    connection.recv()
+                except (EOFError, OSError):
+                    pass
+                connection.close()
+        for process in self._processes:
+            process.join()
+
+    def __enter__(self) -> 'ShardedStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _name_of(product: ProductRef) -> str:
+    """Returns the name an order line or lookup refers to."""
+    if isinstance(product, products.Product):
+        return product.name
+    if isinstance(product, str):
+        return product
+    raise TypeError("First element must be a Product or a product name.")
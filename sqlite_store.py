@@ -0,0 +1,292 @@
+# sqlite_store.py
+import json
+import sqlite3
+import threading
+import weakref
+import products
+import promotions
+import store
+from money import Money
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS promotions (
+    id INTEGER PRIMARY KEY,
+    spec TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    maximum INTEGER,
+    promotion_id INTEGER REFERENCES promotions(id)
+);
+CREATE INDEX IF NOT EXISTS products_name ON products(name);
+CREATE INDEX IF NOT EXISTS products_active ON products(id)
+    WHERE type = 'NonStockedProduct' OR quantity > 0;
+"""
+
+# Statements are kept as constants so sqlite3's statement cache reuses them
+_INSERT = ("INSERT INTO products (id, name, type, price_cents, quantity, maximum, promotion_id) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)")
+_COLUMNS = "id, name, type, price_cents, quantity, maximum, promotion_id"
+_SELECT_ACTIVE = (f"SELECT {_COLUMNS} FROM products "
+                  "WHERE type = 'NonStockedProduct' OR quantity > 0 ORDER BY id")
+_SELECT_PAGE = f"SELECT {_COLUMNS} FROM products WHERE id > ? ORDER BY id LIMIT ?"
+_SELECT_BY_NAME = f"SELECT {_COLUMNS} FROM products WHERE name = ? ORDER BY id LIMIT 1"
+_SELECT_QUANTITY = "SELECT quantity FROM products WHERE id = ?"
+_SET_QUANTITY = "UPDATE products SET quantity = ? WHERE id = ?"
+_DECREMENT = "UPDATE products SET quantity = quantity - ? WHERE id = ?"
+_UPDATE = "UPDATE products SET name = ?, price_cents = ?, maximum = ?, promotion_id = ? WHERE id = ?"
+
+class SQLiteStore:
+    """
+    Store API on top of a local SQLite database.
+
+    The catalog lives in the database, so it does not need to fit in
+    memory: products are only materialized as Product objects when they
+    are returned (get_all_products, get_product) and are reused while
+    something still references them. Materialized and added products stay
+    linked to their row: quantity changes, including direct buy() calls,
+    are written through; price, name and promotion changes need
+    update_product().
+
+    Orders run in one transaction, with the same all-or-nothing checks as
+    store.Store.order.
+    """
+    def __init__(self, path: str = ":memory:"):
+        """Opens (or creates) the database at path."""
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        # Product <-> row id for every live product object of this store
+        self._row_ids: 'weakref.WeakKeyDictionary[products.Product, int]' = weakref.WeakKeyDictionary()
+        self._live: 'weakref.WeakValueDictionary[int, products.Product]' = weakref.WeakValueDictionary()
+        # Promotion objects by promotions.id and row id by spec, loaded lazily
+        self._promotions: Dict[int, promotions.Promotion] = {}
+        self._promotion_ids: Dict[str, int] = {}
+        # id() of the products the store itself is updating after an order, so their
+        # change is not written back; only read and changed under self._lock
+        self._syncing: Set[int] = set()
+
+    def close(self):
+        """Closes the database connection."""
+        self._connection.close()
+
+    # --- Adding and removing ---
+    def add_product(self, product: products.Product):
+        """Adds a product to the store. Adding the same product twice is a no-op."""
+        self.add_products([product])
+
+    def add_products(self, product_list: Iterable[products.Product]):
+        """Adds many products with one executemany in a single transaction."""
+        with self._lock:
+            new_products = []
+            for product in product_list:
+                if not isinstance(product, products.Product):
+                    raise TypeError("Only Product objects can be added.")
+                if product not in self._row_ids:
+                    new_products.append(product)
+            if not new_products:
+                return
+            with self._transaction():
+                # Row ids are assigned here so each product can be linked to its row
+                next_id = self._connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM products").fetchone()[0]
+                rows = []
+                for offset, product in enumerate(new_products):
+                    rows.append((next_id + offset,) + self._row_values(product))
+                self._connection.executemany(_INSERT, rows)
+            for offset, product in enumerate(new_products):
+                self._link(product, next_id + offset)
+
+    def remove_product(self, product: products.Product):
+        """Removes a product from the store."""
+        with self._lock:
+            row_id = self._row_ids.get(product)
+            deleted = 0
+            if row_id is not None:
+                with self._transaction():
+                    deleted = self._connection.execute("DELETE FROM products WHERE id = ?", (row_id,)).rowcount
+            if not deleted:
+                raise ValueError(f"Product '{product.name}' not found.")
+            self._unlink(product)
+
+    def update_product(self, product: products.Product):
+        """Writes a product's name, price, limit and promotion back to its row."""
+        with self._lock:
+            row_id = self._row_ids.get(product)
+            if row_id is None:
+                raise ValueError(f"Product '{product.name}' not found.")
+            _, _, price_cents, _, maximum, promotion_id = self._row_values(product)
+            with self._transaction():
+                self._connection.execute(_UPDATE, (product.name, price_cents, maximum, promotion_id, row_id))
+
+    # --- Reading ---
+    def get_total_quantity(self) -> int:
+        """Returns the total quantity of all stocked items in the store."""
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(quantity), 0) FROM products").fetchone()[0]
+
+    def get_all_products(self) -> Sequence[products.Product]:
+        """Returns all active products in the store, in the order they were added."""
+        with self._lock:
+            return tuple(self._materialize(row) for row in self._connection.execute(_SELECT_ACTIVE))
+
+    def iter_products(self, batch_size: int = 1000) -> Iterator[products.Product]:
+        """Yields every product (active or not) in insertion order, reading batch_size rows at a time."""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._connection.execute(_SELECT_PAGE, (last_id, batch_size)).fetchall()
+                page = [self._materialize(row) for row in rows]
+            if not page:
+                return
+            yield from page
+            last_id = rows[-1][0]
+
+    def snapshot_products(self) -> Tuple[products.Product, ...]:
+        """Returns every product (active or not) in insertion order, read in one query."""
+        with self._lock:
+            return tuple(self._materialize(row) for row in self._connection.execute(_SELECT_PAGE, (0, -1)))
+
+    def get_product(self, name: str) -> Optional[products.Product]:
+        """Returns the first product added under the given name, or None."""
+        with self._lock:
+            row = self._connection.execute(_SELECT_BY_NAME, (name,)).fetchone()
+            return None if row is None else self._materialize(row)
+
+    def __contains__(self, product: products.Product) -> bool:
+        """Checks if a product exists in the store using 'in' operator."""
+        with self._lock:
+            row_id = self._row_ids.get(product)
+            return row_id is not None and self._connection.execute(
+                _SELECT_QUANTITY, (row_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        """Returns the number of products (active or not) in the store."""
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    # --- Ordering ---
+    def order(self, shopping_list: List[Tuple[products.Product, int]]) -> Money:
+        """Processes an order in a single transaction: either every line is bought or none is."""
+        demand = store.Store._validate_order(shopping_list)
+        with self._lock:
+            row_ids = {}
+            for key, (product, _) in demand.items():
+                row_id = self._row_ids.get(product)
+                if row_id is None:
+                    raise store.OrderError(product.name, products.UnknownProduct(product.name))
+                row_ids[key] = row_id
+
+            with self._transaction():
+                # Check against the stock in the database, not the objects
+                remaining = {}
+                for key, (product, quantity) in demand.items():
+                    row = self._connection.execute(_SELECT_QUANTITY, (row_ids[key],)).fetchone()
+                    if row is None:
+                        raise store.OrderError(product.name, products.UnknownProduct(product.name))
+                    try:
+                        product.check_stock(quantity, row[0])
+                    except Exception as e:
+                        raise store.OrderError(product.name, e)
+                    remaining[key] = row[0] - quantity
+
+                total_cents = 0
+                for product, quantity in shopping_list:
+                    try:
+                        total_cents += product._cents_for(quantity)
+                    except Exception as e:
+                        raise store.OrderError(product.name, e)
+
+                self._connection.executemany(_DECREMENT, [(quantity, row_ids[key])
+                                                          for key, (product, quantity) in demand.items()
+                                                          if not isinstance(product, products.NonStockedProduct)])
+
+            # Committed: bring the objects in line with their rows
+            self._syncing.update(demand)
+            try:
+                for key, (product, _) in demand.items():
+                    product.quantity = remaining[key]
+            finally:
+                self._syncing.difference_update(demand)
+        return Money(total_cents)
+
+    # --- Row <-> object mapping ---
+    def _transaction(self):
+        """Returns a context manager running its block in one transaction."""
+        return _Transaction(self._connection)
+
+    def _row_values(self, product: products.Product) -> tuple:
+        """Returns (name, type, price_cents, quantity, maximum, promotion_id) for a product."""
+        data = product.to_dict()
+        return (product.name, data["type"], product.price.cents, product.quantity,
+                data.get("maximum"), self._promotion_id(product.promotion))
+
+    def _promotion_id(self, promotion: Optional[promotions.Promotion]) -> Optional[int]:
+        """Returns the promotions row id for a promotion, inserting it if needed."""
+        if promotion is None:
+            return None
+        spec = json.dumps(promotion.to_dict(), sort_keys=True)
+        promotion_id = self._promotion_ids.get(spec)
+        if promotion_id is None:
+            self._connection.execute("INSERT OR IGNORE INTO promotions (spec) VALUES (?)", (spec,))
+            promotion_id = self._connection.execute("SELECT id FROM promotions WHERE spec = ?", (spec,)).fetchone()[0]
+            self._promotion_ids[spec] = promotion_id
+            self._promotions.setdefault(promotion_id, promotion)
+        return promotion_id
+
+    def _promotion(self, promotion_id: Optional[int]) -> Optional[promotions.Promotion]:
+        """Returns the shared promotion object for a promotions row id."""
+        if promotion_id is None:
+            return None
+        promotion = self._promotions.get(promotion_id)
+        if promotion is None:
+            spec = self._connection.execute("SELECT spec FROM promotions WHERE id = ?", (promotion_id,)).fetchone()[0]
+            promotion = self._promotions[promotion_id] = promotions.from_dict(json.loads(spec))
+            self._promotion_ids[spec] = promotion_id
+        return promotion
+
+    def _materialize(self, row: tuple) -> products.Product:
+        """Returns the live object for a row, building it if there is none."""
+        row_id, name, product_type, price_cents, quantity, maximum, promotion_id = row
+        product = self._live.get(row_id)
+        if product is None:
+            data = {"type": product_type, "name": name, "price": Money(price_cents),
+                    "quantity": quantity, "maximum": maximum}
+            product = products.from_dict(data)
+            product.promotion = self._promotion(promotion_id)
+            self._link(product, row_id)
+        return product
+
+    def _link(self, product: products.Product, row_id: int):
+        self._row_ids[product] = row_id
+        self._live[row_id] = product
+        product._stores += (self,)
+
+    def _unlink(self, product: products.Product):
+        row_id = self._row_ids.pop(product)
+        self._live.pop(row_id, None)
+        product._stores = tuple(other for other in product._stores if other is not self)
+
+    def _on_quantity_change(self, product: products.Product, delta: int, flipped: bool):
+        """Called by Product's quantity setter; writes the new quantity to the product's row."""
+        with self._lock:
+            if id(product) in self._syncing:
+                return
+            row_id = self._row_ids.get(product)
+            if row_id is not None:
+                self._connection.execute(_SET_QUANTITY, (product.quantity, row_id))
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises."""
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    def __enter__(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._connection.execute("ROLLBACK" if exc_type else "COMMIT")
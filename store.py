@@ -1,85 +1,680 @@
 # store.py
+import threading
+from contextlib import ExitStack, nullcontext
+import instrumentation
+import metrics
 import products
-from typing import List, Tuple, Any # Added Any for __add__ type hint
+import reservations
+from money import Money, ZERO
+from typing import ContextManager, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Any, Union # Added Any for __add__ type hint
+
+class OrderError(Exception):
+    """
+    An order was rejected because of one of its products. Args: product_name, cause.
+
+    cause is the underlying error, usually a products.PurchaseError such
+    as OutOfStock; the message is only formatted when it is printed.
+    """
+    @property
+    def product_name(self) -> str:
+        return self.args[0]
+
+    @property
+    def cause(self) -> Exception:
+        return self.args[1]
+
+    def __str__(self) -> str:
+        return f"Order failed for '{self.product_name}': {self.cause}"
+
+class LineFailure(NamedTuple):
+    """Why one line of an order was rejected: its index, its product (None if malformed) and the error."""
+    line: int
+    product: Optional[products.Product]
+    error: Exception
+
+class OrderResult(NamedTuple):
+    """
+    Outcome of an order: its total price, or the error that rejected it.
+
+    Orders placed with order(..., raise_errors=False) also list every
+    failing line in failures, in line order; error is the first of them.
+    """
+    total: Money
+    error: Optional[Exception] = None
+    failures: Tuple[LineFailure, ...] = ()
+
+    @property
+    def ok(self) -> bool:
+        """True if the order went through."""
+        return self.error is None
 
 class Store:
     """
     Represents a store using magic methods for 'in' and '+'.
+
+    Products are kept in an insertion-ordered dict keyed by object identity,
+    plus a name index, so membership, removal and name lookup are O(1).
+
+    With thread_safe=True, order() locks every product it touches (in a
+    fixed order, so multi-line orders cannot deadlock) and the store's own
+    bookkeeping is guarded by a small internal lock.
+
+    The catalog is only reached through _add, remove_product,
+    iter_products, snapshot_products, get_product, get_total_quantity,
+    get_all_products, _on_quantity_change, __contains__ and __len__; ordering, merging and
+    reservations work on the products they are given. A subclass can keep
+    the catalog elsewhere by overriding those, as inventory.InventoryStore
+    does to sit on inventory columns without an object per product.
     """
-    def __init__(self, product_list: List[products.Product]):
+    def __init__(self, product_list: List[products.Product], thread_safe: bool = False):
         """Initializes the store with a list of products."""
         if not isinstance(product_list, list):
              raise TypeError("Initial product list must be a list.")
-        # Store the list internally
-        self.products = product_list
+        self.thread_safe = thread_safe
+        # Guards the counters and indexes below; a no-op when not thread safe
+        self._lock: ContextManager = threading.Lock() if thread_safe else nullcontext()
+        # Backing store: id(product) -> product, in insertion order
+        self._products: Dict[int, products.Product] = {}
+        # Name index: name -> {id(product): product}, names are not unique
+        self._by_name: Dict[str, Dict[int, products.Product]] = {}
+        # Running sum of product quantities, kept current by _on_quantity_change
+        self._total_quantity = 0
+        # Active products by id(product), updated only when a product flips state
+        self._active: Dict[int, products.Product] = {}
+        # Cached read-only view of active products in insertion order (None = stale)
+        self._active_view: Optional[Tuple[products.Product, ...]] = ()
+        # Optional wal.WriteAheadLog receiving every mutation, see attach_log
+        self.log = None
+        # Expiry queue of the stock held by reserve()
+        self.reservations = reservations.ReservationBook()
+        # Units held by reservations, by id(product); see _logged_quantity
+        self._held: Dict[int, int] = {}
+        self.add_products(product_list)
 
     def add_product(self, product: products.Product):
-        """Adds a product to the store."""
+        """Adds a product to the store. Adding the same product twice is a no-op."""
         if not isinstance(product, products.Product):
             raise TypeError("Only Product objects can be added.")
-        self.products.append(product)
+        with product.lock, self._lock:
+            self._add(product)
+        self._wait_for_log()
         # print(f"Product '{product.name}' added.") # Optional confirmation
 
+    def add_products(self, product_list: Iterable[products.Product]):
+        """
+        Adds many products under a single acquisition of the store lock.
+
+        Meant for loading catalogs: unlike add_product it does not take
+        each product's lock, so the products must not be changed by other
+        threads while they are being added.
+        """
+        add = self._add
+        with self._lock:
+            for product in product_list:
+                if not isinstance(product, products.Product):
+                    raise TypeError("Only Product objects can be added.")
+                add(product)
+        self._wait_for_log()
+
+    def _add(self, product: products.Product):
+        """Indexes a product and starts tracking it. Caller holds the store lock."""
+        key = id(product)
+        if key in self._products:
+            return
+        self._products[key] = product
+        self._by_name.setdefault(product.name, {})[key] = product
+        product._stores += (self,)
+        self._total_quantity += product.quantity
+        if product.active:
+            self._active[key] = product
+            self._active_view = None
+        if self.log is not None:
+            self.log.log_add(product)
+
     def remove_product(self, product: products.Product):
         """Removes a product from the store."""
-        try:
-            self.products.remove(product)
-            # print(f"Product '{product.name}' removed.") # Optional confirmation
-        except ValueError:
-            raise ValueError(f"Product '{product.name}' not found.")
+        key = id(product)
+        with product.lock, self._lock:
+            # Every lookup happens before the first change, so a failure leaves the store intact
+            if self._products.get(key) is not product:
+                raise ValueError(f"Product '{product.name}' not found.")
+            indexed_name = self._indexed_name(key, product)
+            same_name = self._by_name[indexed_name]
+            del self._products[key]
+            del same_name[key]
+            if not same_name:
+                del self._by_name[indexed_name]
+            product._stores = tuple(other for other in product._stores if other is not self)
+            self._total_quantity -= product.quantity
+            if self._active.pop(key, None) is not None:
+                self._active_view = None
+            if self.log is not None:
+                self.log.log_remove(product)
+        self._wait_for_log()
+        # print(f"Product '{product.name}' removed.") # Optional confirmation
+
+    def _indexed_name(self, key: int, product: products.Product) -> str:
+        """Returns the name a product is filed under in the name index. Caller holds the store lock."""
+        # name is a plain attribute, so the product may have been renamed
+        # since it was added; only then is the index searched
+        same_name = self._by_name.get(product.name)
+        if same_name is not None and key in same_name:
+            return product.name
+        for name, same_name in self._by_name.items():
+            if key in same_name:
+                return name
+        raise ValueError(f"Product '{product.name}' not found.")
+
+    def attach_log(self, log):
+        """
+        Records every later mutation (add, remove, quantity change) in a wal.WriteAheadLog.
+
+        Attach after replaying the log into the store, not before. From
+        then on, the store's mutating methods return only once their
+        records are fsynced.
+        """
+        self.log = log
+
+    def _wait_for_log(self):
+        """Waits until the calling thread's log records are fsynced; a no-op without a log."""
+        if self.log is not None:
+            self.log.wait_durable()
+
+    def iter_products(self) -> Iterator[products.Product]:
+        """Yields every product (active or not) in insertion order, without copying the catalog."""
+        return iter(self._products.values())
+
+    def snapshot_products(self) -> Tuple[products.Product, ...]:
+        """Returns every product (active or not) in insertion order, copied under the store lock."""
+        with self._lock:
+            return tuple(self._products.values())
+
+    def get_product(self, name: str) -> Optional[products.Product]:
+        """Returns the first product added under the given name, or None."""
+        same_name = self._by_name.get(name)
+        if not same_name:
+            return None
+        return next(iter(same_name.values()))
 
     def get_total_quantity(self) -> int:
         """Returns the total quantity of all stocked items in the store."""
-        total_quantity = 0
-        for product in self.products:
-            # Use the quantity property
-            # We should probably only sum quantities of products that track stock
-            # Let's assume NonStockedProduct correctly returns 0 via its property
-            total_quantity += product.quantity
-        return total_quantity
-
-    def get_all_products(self) -> List[products.Product]:
-        """Returns a list of all active products in the store."""
-        active_products = []
-        for product in self.products:
-            # Use the active property
-            if product.active:
-                active_products.append(product)
-        return active_products
-
-    def order(self, shopping_list: List[Tuple[products.Product, int]]) -> float:
-        """Processes an order."""
-        total_order_price = 0.0
+        # Maintained incrementally; NonStockedProduct never changes it since
+        # its quantity is always 0 and its setter does nothing.
+        return self._total_quantity
+
+    def get_all_products(self) -> Sequence[products.Product]:
+        """Returns a read-only sequence of all active products in the store."""
+        view = self._active_view
+        if view is None:
+            with self._lock:
+                # Rebuild only after an activation change, keeping insertion order
+                active = self._active
+                view = self._active_view = tuple(product for key, product in self._products.items()
+                                                 if key in active)
+        return view
+
+    def order(self, shopping_list: List[Tuple[products.Product, int]],
+              raise_errors: bool = True, trusted: bool = False) -> Union[Money, OrderResult]:
+        """
+        Processes an order atomically: either every line is bought or none is.
+
+        Phase one validates every line and checks that each product has
+        enough stock for the sum of its lines; nothing is changed if any
+        check fails. Phase two prices and decrements each line, restoring
+        the original quantities if anything still goes wrong.
+
+        Returns the total price, or raises the first problem found (an
+        OrderError for problems with a product). With raise_errors=False
+        it returns an OrderResult instead and keeps checking after the
+        first problem, so failures lists every rejected line; a stock
+        problem is reported on the first line of its product.
+
+        trusted=True is a fast path for callers that build their shopping
+        lists themselves, such as batch jobs: it skips the shape and type
+        checks (the list must hold (Product, int) tuples), finds problems
+        without raising, and decrements each product once for all its
+        lines instead of calling buy() per line. It always returns an
+        OrderResult.
+
+        shopping_list may also be a Reservation from reserve(): its lines
+        are bought from the stock it holds, at the current prices.
+        """
+        if self.reservations:
+            self.expire_reservations()
+        if isinstance(shopping_list, reservations.Reservation):
+            order = self._order_reserved if raise_errors else self._order_reserved_result
+        elif trusted:
+            order = self._order_trusted
+        else:
+            order = self._order if raise_errors else self._order_result
+        if metrics.ENABLED:
+            total = metrics.observe_order(order, shopping_list)
+        else:
+            total = order(shopping_list)
+        self._wait_for_log()
+        return total
+
+    def _order(self, shopping_list: List[Tuple[products.Product, int]]) -> Money:
+        """The body of order()."""
+        instrumented = instrumentation.ENABLED
+        if instrumented:
+            with instrumentation.stage("validation"):
+                demand = self._validate_order(shopping_list)
+        else:
+            demand = self._validate_order(shopping_list)
+
+        with self._hold(product for product, _ in demand.values()):
+            if instrumented:
+                with instrumentation.stage("stock_check"):
+                    self._check_demand(demand)
+            else:
+                self._check_demand(demand)
+
+            return self._commit(shopping_list, demand)
+
+    def _order_result(self, shopping_list: List[Tuple[products.Product, int]]) -> OrderResult:
+        """The body of order(..., raise_errors=False)."""
+        if not isinstance(shopping_list, list):
+            return OrderResult(ZERO, TypeError("Shopping list must be a list of tuples."))
+
+        failures: List[LineFailure] = []
+        demand: Dict[int, List[Any]] = {}
+        first_lines: Dict[int, int] = {}
+        for line, item in enumerate(shopping_list):
+            try:
+                product, quantity = self._validate_line(item)
+            except Exception as e:
+                product = item[0] if isinstance(item, tuple) and item and isinstance(item[0], products.Product) else None
+                failures.append(LineFailure(line, product, e))
+                continue
+            key = id(product)
+            entry = demand.get(key)
+            if entry is None:
+                demand[key] = [product, quantity]
+                first_lines[key] = line
+            else:
+                entry[1] += quantity
+        return self._settle(shopping_list, demand, first_lines, failures, self._commit)
+
+    def _order_trusted(self, shopping_list: List[Tuple[products.Product, int]]) -> OrderResult:
+        """The body of order(..., trusted=True)."""
+        failures: List[LineFailure] = []
+        demand: Dict[int, List[Any]] = {}
+        first_lines: Dict[int, int] = {}
+        line = 0
+        for product, quantity in shopping_list:
+            error = product.purchase_error(quantity)
+            if error is not None:
+                failures.append(LineFailure(line, product, OrderError(product.name, error)))
+            else:
+                key = id(product)
+                entry = demand.get(key)
+                if entry is None:
+                    demand[key] = [product, quantity]
+                    first_lines[key] = line
+                else:
+                    entry[1] += quantity
+            line += 1
+        return self._settle(shopping_list, demand, first_lines, failures, self._commit_demand)
+
+    def _settle(self, shopping_list: List[Tuple[products.Product, int]], demand: Dict[int, List[Any]],
+                first_lines: Dict[int, int], failures: List[LineFailure], commit) -> OrderResult:
+        """Checks stock for validated demand and commits it if no line failed, as an OrderResult."""
+        with self._hold(product for product, _ in demand.values()):
+            # stock_error returns instead of raising, so a sold-out line costs no exception
+            for key, (product, quantity) in demand.items():
+                error = product.stock_error(quantity)
+                if error is not None:
+                    failures.append(LineFailure(first_lines[key], product, OrderError(product.name, error)))
+            if failures:
+                if len(failures) > 1:
+                    failures.sort(key=lambda failure: failure.line)
+                return OrderResult(ZERO, failures[0].error, tuple(failures))
+            try:
+                return OrderResult(commit(shopping_list, demand))
+            except Exception as e:
+                return OrderResult(ZERO, e)
+
+    def _commit_demand(self, shopping_list: List[Tuple[products.Product, int]],
+                       demand: Dict[int, List[Any]]) -> Money:
+        """
+        Prices every line, then takes each product's total demand from stock
+        with one quantity write. Caller holds the locks.
+
+        Nothing is decremented until every line is priced, so there is
+        nothing to roll back.
+        """
+        line_cents = []
+        for product, quantity in shopping_list:
+            try:
+                line_cents.append(product._cents_for(quantity))
+            except Exception as e:
+                raise OrderError(product.name, e)
+        for product, quantity in demand.values():
+            product.quantity -= quantity # A no-op for NonStockedProduct
+        if metrics.ENABLED:
+            for (product, _), cents in zip(shopping_list, line_cents):
+                metrics.record_sale(product, cents)
+        # Lines are int cents; the total becomes Money only here
+        return Money(sum(line_cents))
+
+    def _commit(self, shopping_list: List[Tuple[products.Product, int]], demand: Dict[int, List[Any]]) -> Money:
+        """Buys every line of a checked order, rolling all of it back if a line fails. Caller holds the locks."""
+        # Remember quantities so a failure can be rolled back
+        original_quantities = [(product, product.quantity) for product, _ in demand.values()]
+        recording = metrics.ENABLED
+        line_prices = []
+        try:
+            # Sales are recorded below, once no line can be rolled back any more
+            with metrics.deferred_sales() if recording else nullcontext():
+                for product, quantity in shopping_list:
+                    line_prices.append(product.buy(quantity))
+        except Exception as e:
+            for stocked, quantity in original_quantities:
+                stocked.quantity = quantity
+            raise OrderError(product.name, e)
+        if recording:
+            for (product, _), line_price in zip(shopping_list, line_prices):
+                metrics.record_sale(product, line_price.cents)
+        # Summed as int cents and wrapped once, as in _commit_demand
+        return Money(sum(line_price.cents for line_price in line_prices))
+
+    # --- Reservations ---
+    def reserve(self, shopping_list: List[Tuple[products.Product, int]], ttl: float,
+                reservation: Optional[reservations.Reservation] = None) -> reservations.Reservation:
+        """
+        Takes an order's stock out of sale for ttl seconds and returns the Reservation.
+
+        The checks are those of order(), and the stock is withdrawn at once,
+        so a later order(reservation) cannot run out. Unless it is ordered
+        or released first, the stock returns when the reservation expires;
+        expired reservations are swept at the next order(), reserve() or
+        expire_reservations() call.
+
+        Passing an existing (held) reservation adds the lines to it, like
+        adding to a cart, and restarts its ttl.
+
+        Reservations live in memory only: an attached log keeps recording
+        the held units as stock, so after a crash they are back on sale.
+        """
+        if ttl <= 0:
+            raise ValueError("Reservation ttl must be positive.")
+        self.expire_reservations()
+        demand = self._validate_order(shopping_list)
+        with self._hold(product for product, _ in demand.values()):
+            self._check_demand(demand)
+            # Held before the decrement, so the logged quantity stays unchanged
+            self._change_held(demand.values(), 1)
+            for product, quantity in demand.values():
+                product.quantity -= quantity # A no-op for NonStockedProduct
+
+        expires_at = self.reservations.clock() + ttl
+        with self._lock:
+            if reservation is None:
+                reservation = reservations.Reservation(self, list(shopping_list), expires_at)
+                added = True
+            elif reservation.store is self and reservation.held:
+                reservation.lines.extend(shopping_list)
+                reservation.expires_at = expires_at
+                added = True
+            else:
+                added = False
+            if added:
+                self.reservations.push(reservation)
+        if not added:
+            self._restock(shopping_list)
+            raise reservations.ReservationError(f"Reservation is {reservation.state} or not from this store.")
+        self._wait_for_log()
+        return reservation
+
+    def release(self, reservation: reservations.Reservation):
+        """Gives the stock of a held reservation back; a no-op for one that is no longer held."""
+        with self._lock:
+            if reservation.store is not self or not reservation.held:
+                return
+            reservation.state = reservations.RELEASED
+        self._restock(reservation.lines)
+        self._wait_for_log()
+
+    def expire_reservations(self) -> int:
+        """Returns the stock of every reservation past its expiry; returns how many expired."""
+        with self._lock:
+            expired = self.reservations.pop_expired()
+        for reservation in expired:
+            self._restock(reservation.lines)
+        if expired:
+            self._wait_for_log()
+        return len(expired)
+
+    def _restock(self, lines: List[Tuple[products.Product, int]]):
+        """Puts the quantities of reserved lines back into stock."""
+        returned: Dict[int, List[Any]] = {}
+        for product, quantity in lines:
+            entry = returned.setdefault(id(product), [product, 0])
+            entry[1] += quantity
+        with self._hold(product for product, _ in returned.values()):
+            self._change_held(returned.values(), -1)
+            for product, quantity in returned.values():
+                product.quantity += quantity
+
+    def _change_held(self, amounts: Iterable[List[Any]], sign: int):
+        """Adds (sign=1) or removes (sign=-1) reserved units per product, given as [product, quantity] pairs."""
+        held = self._held
+        with self._lock:
+            for product, quantity in amounts:
+                key = id(product)
+                remaining = held.get(key, 0) + sign * quantity
+                if remaining:
+                    held[key] = remaining
+                else:
+                    held.pop(key, None)
+
+    def _logged_quantity(self, product: products.Product) -> int:
+        """
+        Returns the quantity the log records for product: its stock plus what reservations hold.
+
+        Reservations do not survive a restart, so the held units are logged
+        as stock and come back on replay. Reads without taking the store lock.
+        """
+        return product.quantity + self._held.get(id(product), 0)
+
+    def _order_reserved(self, reservation: reservations.Reservation) -> Money:
+        """The body of order(reservation): marks the reservation ordered and prices its held lines."""
+        with self._lock:
+            if reservation.store is not self or not reservation.held:
+                raise reservations.ReservationError(f"Reservation is {reservation.state} or not from this store.")
+            # Marked first, so reserve() cannot add lines to it while this copy is priced
+            reservation.state = reservations.ORDERED
+            lines = list(reservation.lines)
+        line_cents = []
+        for product, quantity in lines:
+            try:
+                line_cents.append(product._cents_for(quantity))
+            except Exception as e:
+                with self._lock:
+                    # Still held, so it can be ordered again; expiry may have skipped it meanwhile
+                    reservation.state = reservations.HELD
+                    self.reservations.push(reservation)
+                raise OrderError(product.name, e)
+        sold: Dict[int, List[Any]] = {}
+        for product, quantity in lines:
+            sold.setdefault(id(product), [product, 0])[1] += quantity
+        self._change_held(sold.values(), -1)
+        if self.log is not None:
+            # The sale leaves the stock alone, so it is logged here
+            with self._lock:
+                for product, _ in sold.values():
+                    if not isinstance(product, products.NonStockedProduct):
+                        self.log.log_quantity(product, self._logged_quantity(product))
+        if metrics.ENABLED:
+            for (product, _), cents in zip(lines, line_cents):
+                metrics.record_sale(product, cents)
+        return Money(sum(line_cents))
+
+    def _order_reserved_result(self, reservation: reservations.Reservation) -> OrderResult:
+        """The body of order(reservation, raise_errors=False)."""
+        try:
+            return OrderResult(self._order_reserved(reservation))
+        except Exception as e:
+            return OrderResult(ZERO, e)
+
+    def quote(self, shopping_list: List[Tuple[products.Product, int]]) -> Money:
+        """
+        Returns what the order would cost right now, without changing stock.
+
+        Runs the same checks as order() and raises the same errors.
+        """
+        demand = self._validate_order(shopping_list)
+        self._check_demand(demand)
+        return Money(sum(product._cents_for(quantity) for product, quantity in shopping_list))
+
+    @staticmethod
+    def _validate_order(shopping_list: List[Tuple[products.Product, int]]) -> Dict[int, List[Any]]:
+        """
+        Validates every line of an order without looking at stock.
+
+        Returns the total quantity requested per product as
+        {id(product): [product, quantity]}.
+        """
         if not isinstance(shopping_list, list):
             raise TypeError("Shopping list must be a list of tuples.")
 
+        demand: Dict[int, List[Any]] = {}
+        validate_line = Store._validate_line
         for item in shopping_list:
-            if not isinstance(item, tuple) or len(item) != 2:
-                raise ValueError("Each item must be a tuple (Product, quantity).")
+            product, quantity = validate_line(item)
+            entry = demand.get(id(product))
+            if entry is None:
+                demand[id(product)] = [product, quantity]
+            else:
+                entry[1] += quantity
+        return demand
+
+    @staticmethod
+    def _validate_line(item: Any) -> Tuple[products.Product, int]:
+        """Checks one (product, quantity) line of an order and returns it."""
+        if not isinstance(item, tuple) or len(item) != 2:
+            raise ValueError("Each item must be a tuple (Product, quantity).")
 
-            product, quantity = item
+        product, quantity = item
 
-            if not isinstance(product, products.Product):
-                 raise TypeError("First element must be a Product.")
-            if not isinstance(quantity, int) or quantity <= 0:
-                raise ValueError("Quantity must be a positive integer.")
+        if not isinstance(product, products.Product):
+             raise TypeError("First element must be a Product.")
+        if not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError("Quantity must be a positive integer.")
 
+        try:
+            # Per-line checks (e.g. LimitedProduct.maximum)
+            product.validate_purchase(quantity)
+        except Exception as e:
+            raise OrderError(product.name, e)
+        return item
+
+    @staticmethod
+    def _check_demand(demand: Dict[int, List[Any]]):
+        """Checks active state and stock against everything an order asks for."""
+        for product, quantity in demand.values():
             try:
-                # Call the product's buy method (which uses properties/promotions)
-                item_total_price = product.buy(quantity)
-                total_order_price += item_total_price
+                product.check_stock(quantity)
             except Exception as e:
-                raise Exception(f"Order failed for '{product.name}': {e}")
+                raise OrderError(product.name, e)
+
+    def _hold(self, products_to_lock: Iterable[products.Product]) -> ContextManager:
+        """Locks the given products in id() order when the store is thread safe."""
+        if not self.thread_safe:
+            return nullcontext()
+        stack = ExitStack()
+        for product in sorted(products_to_lock, key=id):
+            stack.enter_context(product.lock)
+        return stack
 
-        return total_order_price
+    def order_batch(self, shopping_lists: List[List[Tuple[products.Product, int]]]) -> List[OrderResult]:
+        """
+        Processes many orders in one pass, first come first served.
+
+        Demand is tracked per product instead of calling buy() per line:
+        each order is checked against the stock left by the orders before
+        it, line prices are computed once per (product, quantity), and each
+        product's quantity is written once at the end. Every order is still
+        all-or-nothing; rejected orders are reported in their OrderResult
+        instead of raising.
+        """
+        if not isinstance(shopping_lists, list):
+            raise TypeError("Shopping lists must be a list of shopping lists.")
+
+        demands: List[Any] = []
+        touched: Dict[int, products.Product] = {}
+        for shopping_list in shopping_lists:
+            try:
+                demand = self._validate_order(shopping_list)
+            except Exception as e:
+                demands.append(e)
+                continue
+            demands.append(demand)
+            for key, (product, _) in demand.items():
+                touched[key] = product
+
+        results: List[OrderResult] = []
+        with self._hold(touched.values()):
+            remaining = {key: product.quantity for key, product in touched.items()}
+            line_cents: Dict[Tuple[int, int], int] = {}
+            for shopping_list, demand in zip(shopping_lists, demands):
+                if isinstance(demand, Exception):
+                    results.append(OrderResult(ZERO, demand))
+                    continue
+                try:
+                    for key, (product, quantity) in demand.items():
+                        try:
+                            product.check_stock(quantity, remaining[key])
+                        except Exception as e:
+                            raise OrderError(product.name, e)
+                    total_cents = 0
+                    for product, quantity in shopping_list:
+                        price_key = (id(product), quantity)
+                        cents = line_cents.get(price_key)
+                        if cents is None:
+                            try:
+                                cents = line_cents[price_key] = product._cents_for(quantity)
+                            except Exception as e:
+                                raise OrderError(product.name, e)
+                        total_cents += cents
+                except Exception as e:
+                    results.append(OrderResult(ZERO, e))
+                    continue
+                for key, (product, quantity) in demand.items():
+                    remaining[key] -= quantity
+                results.append(OrderResult(Money(total_cents)))
+
+            # One decrement per product for the whole batch
+            for key, product in touched.items():
+                if remaining[key] != product.quantity:
+                    product.quantity = remaining[key]
+        self._wait_for_log()
+        return results
+
+    def _on_quantity_change(self, product: products.Product, delta: int, flipped: bool):
+        """Called by Product's quantity setter after the quantity changed by delta."""
+        with self._lock:
+            self._total_quantity += delta
+            if flipped:
+                if product.active:
+                    self._active[id(product)] = product
+                else:
+                    self._active.pop(id(product), None)
+                self._active_view = None
+            if self.log is not None:
+                self.log.log_quantity(product, self._logged_quantity(product))
 
     # --- Magic Methods ---
     def __contains__(self, product: products.Product) -> bool:
         """Checks if a product exists in the store using 'in' operator."""
-        # This relies on Product instances being comparable for equality,
-        # which they are by default (object identity). If we needed
-        # equality based on name/price, we'd need to implement __eq__ in Product.
-        return product in self.products
+        # Membership is by object identity (Product does not define __eq__),
+        # so a dict lookup on id() gives the same answer as a list scan.
+        return id(product) in self._products
+
+    def __len__(self) -> int:
+        """Returns the number of products (active or not) in the store."""
+        return len(self._products)
 
     def __add__(self, other: Any) -> 'Store':
         """Combines two stores using the '+' operator."""
@@ -88,10 +683,58 @@ class Store:
             # for the given type 'other'. This allows Python to try other.__radd__(self)
             return NotImplemented
 
-        # Create a new list containing products from both stores
-        # This creates a shallow copy; the Product objects themselves are not duplicated.
-        combined_list = self.products + other.products
+        # Products in both stores appear once; the Product objects themselves are shared.
+        return Store.merge(self, other)
+
+    @classmethod
+    def merge(cls, *stores: 'Store', key: str = "identity", stock: str = "sum") -> 'Store':
+        """
+        Combines any number of stores into a new one in a single linear pass.
+
+        Args:
+            key: How duplicates are recognized. "identity" keeps each
+                 Product object once. "name" also treats different
+                 objects with the same name as one SKU.
+            stock: For key="name", how the quantities of a duplicated SKU
+                   are reconciled: "sum", "max" or "first".
+
+        Products that occur once are shared with the source stores, not
+        copied, so buying them through the merged store also updates the
+        sources. A SKU found in several stores under key="name" becomes a
+        new product: a copy of its first occurrence (with the same
+        promotion object) holding the reconciled quantity.
+        """
+        if key not in ("identity", "name"):
+            raise ValueError("key must be 'identity' or 'name'.")
+        if stock not in ("sum", "max", "first"):
+            raise ValueError("stock must be 'sum', 'max' or 'first'.")
+        for store_instance in stores:
+            if not isinstance(store_instance, Store):
+                raise TypeError("Only Store objects can be merged.")
+
+        merged = cls([], thread_safe=any(store_instance.thread_safe for store_instance in stores))
+        if key == "identity":
+            for store_instance in stores:
+                merged.add_products(store_instance.iter_products())
+            return merged
 
-        # Return a new Store instance with the combined list
-        return Store(combined_list)
+        # key == "name": group distinct objects by name, keeping first-seen order
+        by_name: Dict[str, Dict[int, products.Product]] = {}
+        for store_instance in stores:
+            for product in store_instance.iter_products():
+                by_name.setdefault(product.name, {})[id(product)] = product
 
+        combined_list = []
+        for same_name in by_name.values():
+            if len(same_name) == 1:
+                combined_list.extend(same_name.values())
+                continue
+            duplicates = list(same_name.values())
+            first = duplicates[0]
+            copy = products.from_dict({**first.to_dict(), "promotion": None})
+            copy.promotion = first.promotion
+            quantities = [product.quantity for product in duplicates]
+            copy.quantity = {"sum": sum, "max": max, "first": lambda values: values[0]}[stock](quantities)
+            combined_list.append(copy)
+        merged.add_products(combined_list)
+        return merged
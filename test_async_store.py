@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+import products
+import store
+import async_store
+
+def test_order_many_sells_available_stock_only():
+    """Test concurrent orders succeed until stock runs out and failures are returned."""
+    product = products.Product("Google Pixel 7", price=500, quantity=3)
+    shop = async_store.AsyncStore(store.Store([product]), max_concurrent_orders=2)
+    results = asyncio.run(shop.order_many([[(product, 1)] for _ in range(5)]))
+
+    assert results[:3] == [500, 500, 500]
+    assert all(isinstance(result, Exception) for result in results[3:])
+    assert shop.get_total_quantity() == 0
+    assert shop.running == shop.waiting == 0
+
+def test_before_commit_failure_keeps_stock():
+    """Test an order cancelled in before_commit does not change stock."""
+    product = products.Product("Google Pixel 7", price=500, quantity=3)
+    shop = async_store.AsyncStore(store.Store([product]))
+
+    async def decline(shopping_list):
+        await asyncio.sleep(0)
+        raise Exception("payment declined")
+
+    with pytest.raises(Exception, match="payment declined"):
+        asyncio.run(shop.order([(product, 2)], before_commit=decline))
+    assert product.quantity == 3
+
+def test_rejects_orders_when_queue_is_full():
+    """Test max_waiting turns away orders instead of queueing them."""
+    product = products.Product("Google Pixel 7", price=500, quantity=10)
+    shop = async_store.AsyncStore(store.Store([product]), max_concurrent_orders=1, max_waiting=1)
+
+    async def slow(shopping_list):
+        await asyncio.sleep(0.01)
+
+    async def run():
+        return await asyncio.gather(*(shop.order([(product, 1)], before_commit=slow) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[:2] == [500, 500]
+    assert isinstance(results[2], async_store.StoreBusyError)
+
+def test_product_locks_go_with_their_products():
+    """Test per-product locks are dropped with the product, e.g. a row view nobody holds any more."""
+    import gc
+    import inventory
+    columns = inventory.ColumnarInventory()
+    for index in range(3):
+        columns.add(f"Product {index}", price=10, quantity=5)
+    shop = async_store.AsyncStore(inventory.InventoryStore(columns))
+    for product in shop.get_all_products():
+        asyncio.run(shop.order([(product, 1)]))
+    del product
+    gc.collect()
+    assert len(shop._locks) == 0
+    assert shop.get_total_quantity() == 12
@@ -0,0 +1,65 @@
+import io
+import json
+import pytest
+import products
+import store
+import sqlite_store
+import catalog
+from money import Money
+
+CSV_CATALOG = """type,name,price,quantity,maximum,promotion_type,promotion_name,percent
+Product,MacBook Air M2,1450,100,,SecondHalfPrice,Second Half price!,
+,Google Pixel 7,500,250,,,,
+NonStockedProduct,Windows License,125,,,PercentDiscount,30% off!,30
+LimitedProduct,Shipping,10,250,1,,,
+Product,Bose QuietComfort Earbuds,250,500,,SecondHalfPrice,Second Half price!,
+"""
+
+def test_import_csv_in_chunks():
+    """Test a CSV catalog loads every product type and shares promotions."""
+    best_buy = store.Store([])
+    assert catalog.import_csv(best_buy, io.StringIO(CSV_CATALOG), chunk_size=2) == 5
+    assert best_buy.get_total_quantity() == 100 + 250 + 250 + 500
+    assert isinstance(best_buy.get_product("Windows License"), products.NonStockedProduct)
+    assert best_buy.get_product("Shipping").maximum == 1
+    assert best_buy.get_product("Windows License").promotion.percent == 30
+    assert best_buy.get_product("MacBook Air M2").promotion is best_buy.get_product("Bose QuietComfort Earbuds").promotion
+
+def test_import_jsonl_into_sqlite():
+    """Test a JSON Lines catalog (Product.to_dict format) loads into a SQLiteStore."""
+    lines = [products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1).to_dict(),
+             products.Product("Google Pixel 7", price=499.99, quantity=3).to_dict()]
+    source = io.StringIO("".join(f"{json.dumps(line)}\n" for line in lines))
+    best_buy = sqlite_store.SQLiteStore()
+    assert catalog.import_jsonl(best_buy, source) == 2
+    assert best_buy.get_product("Google Pixel 7").price == Money.of("499.99")
+    assert best_buy.get_total_quantity() == 253
+
+def test_invalid_row_reports_line():
+    """Test a bad row is reported with its line number."""
+    with pytest.raises(ValueError, match="line 3"):
+        catalog.import_csv(store.Store([]), io.StringIO("name,price\nOk,1\nBad,-5\n"))
+
+def test_snapshot_and_jsonl_round_trip(tmp_path):
+    """Test a store survives a binary snapshot and a JSON Lines export unchanged."""
+    best_buy = store.Store([])
+    catalog.import_csv(best_buy, io.StringIO(CSV_CATALOG))
+    best_buy.get_product("Google Pixel 7").quantity = 0 # Inactive products are kept too
+    expected = [str(product) for product in best_buy.iter_products()]
+
+    path = tmp_path / "catalog.snapshot"
+    assert catalog.write_snapshot(best_buy, str(path)) == 5
+    restored = store.Store([])
+    assert catalog.read_snapshot(restored, str(path)) == 5
+    assert [str(product) for product in restored.iter_products()] == expected
+    assert restored.get_total_quantity() == best_buy.get_total_quantity()
+    assert restored.get_product("MacBook Air M2").promotion is restored.get_product("Bose QuietComfort Earbuds").promotion
+
+    exported = io.StringIO()
+    assert catalog.export_jsonl(restored, exported) == 5
+    reimported = store.Store([])
+    catalog.import_jsonl(reimported, io.StringIO(exported.getvalue()))
+    assert [str(product) for product in reimported.iter_products()] == expected
+
+    with pytest.raises(ValueError, match="corrupt"):
+        list(catalog.iter_snapshot(io.BytesIO(path.read_bytes()[:-10])))
@@ -0,0 +1,94 @@
+import pytest
+import products
+import promotions
+import inventory
+
+def make_inventory():
+    """Builds a small columnar inventory."""
+    columns = inventory.ColumnarInventory()
+    columns.add("MacBook Air M2", 1450, 100, promotion=promotions.SecondHalfPrice("Second Half price!"))
+    columns.add("Windows License", 125, kind=inventory.KIND_NON_STOCKED)
+    columns.add_product(products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1))
+    return columns
+
+def test_views_read_and_write_columns():
+    """Test views expose the row data and write back to the columns."""
+    columns = make_inventory()
+    macbook = columns.get("MacBook Air M2")
+    assert isinstance(macbook, products.Product)
+    assert macbook is columns.view(0)
+    assert macbook.price == 1450 and macbook.quantity == 100 and macbook.active
+
+    assert macbook.buy(2) == 1450 + 725
+    assert columns.quantities[0] == 98
+    macbook.quantity = 0
+    assert columns.actives[0] == 0
+
+    shipping = columns.get("Shipping")
+    assert isinstance(shipping, products.LimitedProduct)
+    with pytest.raises(Exception, match="Maximum allowed is 1"):
+        shipping.buy(2)
+
+def test_store_over_inventory():
+    """Test a Store built from views keeps its counters in sync with the columns."""
+    columns = make_inventory()
+    best_buy = columns.to_store()
+    assert best_buy.get_total_quantity() == columns.total_quantity() == 350
+
+    best_buy.order([(columns.get("MacBook Air M2"), 100), (columns.get("Windows License"), 3)])
+    assert best_buy.get_total_quantity() == columns.total_quantity() == 250
+    assert [product.name for product in best_buy.get_all_products()] == ["Windows License", "Shipping"]
+
+def test_store_keeps_rows_not_views():
+    """Test to_store creates no view per row and tracks removals, re-adds and new rows."""
+    columns = make_inventory()
+    best_buy = columns.to_store()
+    assert len(columns._views) == 0 and len(best_buy) == 3
+
+    macbook = columns.get("MacBook Air M2")
+    assert macbook in best_buy and best_buy.get_product("Shipping") is columns.view(2)
+    best_buy.remove_product(macbook)
+    assert macbook not in best_buy and best_buy.get_product("MacBook Air M2") is None
+    assert best_buy.get_total_quantity() == 250
+    macbook.buy(10) # Outside the store now, so its total stays put
+    assert best_buy.get_total_quantity() == 250
+    best_buy.add_product(macbook)
+    assert best_buy.get_total_quantity() == 340
+
+    row = columns.add("Headphones", 50, 5) # Not part of the store until added
+    assert columns.view(row) not in best_buy
+    best_buy.add_product(columns.view(row))
+    assert [product.name for product in best_buy.iter_products()] == [
+        "MacBook Air M2", "Windows License", "Shipping", "Headphones"]
+    with pytest.raises(TypeError):
+        best_buy.add_product(products.Product("Loose", price=1, quantity=1))
+
+def test_renaming_a_row_keeps_later_rows_findable():
+    """Test renaming the first row of a name hands the name to the next row with it."""
+    columns = inventory.ColumnarInventory()
+    columns.add("A", 1, 1)
+    columns.add("A", 2, 1)
+    best_buy = columns.to_store()
+    columns.view(0).name = "B"
+    assert columns.get("A") is columns.view(1) and best_buy.get_product("A") is columns.view(1)
+    assert columns.get("B") is columns.view(0)
+    columns.view(1).name = "B" # A later row does not take over the name
+    assert columns.get("B") is columns.view(0) and columns.get("A") is None
+
+def test_concurrent_view_creation_shares_one_view():
+    """Test threads asking for the same row at once all get the same view."""
+    import threading
+    columns = make_inventory()
+    views = []
+    barrier = threading.Barrier(8)
+
+    def fetch():
+        barrier.wait()
+        views.append(columns.view(0))
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(view is views[0] for view in views)
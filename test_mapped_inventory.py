@@ -0,0 +1,40 @@
+import products
+import promotions
+import mapped_inventory
+
+def test_reopen_keeps_rows_promotions_and_purchases(tmp_path):
+    """Test rows, promotions and in-place quantity updates survive reopening."""
+    path = str(tmp_path / "inventory.bin")
+    with mapped_inventory.MappedInventory(path, capacity=2) as columns:
+        columns.add("MacBook Air M2", 1450, 100, promotion=promotions.SecondHalfPrice("Second Half price!"))
+        columns.add_product(products.NonStockedProduct("Windows License", price=125))
+        columns.add_product(products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1)) # Grows the file
+        best_buy = columns.to_store()
+        assert best_buy.order([(columns.get("MacBook Air M2"), 2)]) == 1450 + 725
+        del best_buy
+
+    with mapped_inventory.MappedInventory(path) as columns:
+        assert len(columns) == 3
+        macbook = columns.get("MacBook Air M2")
+        assert macbook.quantity == 98
+        assert macbook.promotion.name == "Second Half price!"
+        assert isinstance(columns.get("Shipping"), products.LimitedProduct)
+        assert columns.get("Shipping").maximum == 1
+        assert columns.total_quantity() == 98 + 250
+        macbook.quantity = 0
+        assert not macbook.active
+
+def test_persistent_store_opens_without_views(tmp_path):
+    """Test main's persistent store reopens lazily and keeps its purchases."""
+    import main
+    path = str(tmp_path / "inventory.bin")
+    best_buy = main.setup_persistent_store(path)
+    best_buy.order([(best_buy.get_product("Google Pixel 7"), 5)])
+    best_buy.inventory.close()
+    del best_buy
+
+    best_buy = main.setup_persistent_store(path)
+    assert len(best_buy.inventory._views) == 0
+    assert len(best_buy) == 5 and best_buy.get_total_quantity() == 100 + 500 + 245 + 250
+    assert best_buy.get_product("Google Pixel 7").quantity == 245
+    best_buy.inventory.close()
@@ -0,0 +1,111 @@
+import threading
+import urllib.request
+import pytest
+import metrics
+import products
+import promotions
+import store
+
+@pytest.fixture
+def recording():
+    """Enables metrics with fresh counters for one test."""
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+def make_store():
+    macbook = products.Product("MacBook Air M2", price=1450, quantity=100)
+    macbook.promotion = promotions.SecondHalfPrice("Second Half price!")
+    return store.Store([macbook,
+                        products.Product("Google Pixel 7", price=500, quantity=3),
+                        products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1)])
+
+def test_orders_feed_counters(recording):
+    """Test successes, failures by reason, revenue and stock across threads."""
+    best_buy = make_store()
+    macbook, pixel, shipping = best_buy.get_all_products()
+    metrics.watch(best_buy, "main")
+
+    threads = [threading.Thread(target=best_buy.order, args=([(macbook, 2), (pixel, 1)],)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for shopping_list in ([(pixel, 5)], [(shipping, 2)]):
+        with pytest.raises(Exception):
+            best_buy.order(shopping_list)
+    pixel.buy(1) # Direct purchases count as revenue too
+    with pytest.raises(Exception):
+        best_buy.order([(pixel, 1)])
+
+    text = metrics.render()
+    assert "bestbuy_orders_total 2\n" in text
+    assert 'bestbuy_orders_failed_total{reason="out_of_stock"} 1' in text
+    assert 'bestbuy_orders_failed_total{reason="limit_exceeded"} 1' in text
+    assert 'bestbuy_orders_failed_total{reason="inactive"} 1' in text
+    assert 'bestbuy_revenue_cents_total{promotion="Second Half price!"} 435000' in text
+    assert 'bestbuy_revenue_cents_total{promotion="none"} 150000' in text
+    assert 'bestbuy_order_latency_seconds_count 5' in text
+    assert 'bestbuy_stock_quantity{store="main",product="MacBook Air M2"} 96' in text
+    assert 'bestbuy_stock_total{store="main"} 346' in text
+
+def test_rolled_back_order_records_no_revenue(recording):
+    """Test lines bought before a later line fails are not counted as revenue."""
+    class FailingProduct(products.Product):
+        __slots__ = ()
+        def buy(self, quantity):
+            raise RuntimeError("payment declined")
+
+    best_buy = make_store()
+    macbook = best_buy.get_product("MacBook Air M2")
+    failing = FailingProduct("Broken", price=1, quantity=10)
+    best_buy.add_product(failing)
+    with pytest.raises(store.OrderError):
+        best_buy.order([(macbook, 2), (failing, 1)])
+    assert macbook.quantity == 100
+    assert "bestbuy_revenue_cents_total{" not in metrics.render()
+    macbook.buy(1) # Recording is only deferred inside the order
+    assert 'bestbuy_revenue_cents_total{promotion="Second Half price!"} 145000' in metrics.render()
+
+def test_render_while_the_catalog_changes(recording):
+    """Test stock is exported from a copy of the catalog, so products added meanwhile do not break it."""
+    arrivals = []
+    class ArrivalProduct(products.Product):
+        __slots__ = ()
+        @property
+        def quantity(self) -> int:
+            while arrivals: # Stands in for another thread adding while the exporter renders
+                best_buy.add_product(arrivals.pop())
+            return self._quantity
+        quantity = quantity.setter(products.Product.quantity.fset)
+
+    best_buy = store.Store([ArrivalProduct("Google Pixel 7", price=500, quantity=3)], thread_safe=True)
+    metrics.watch(best_buy, "main")
+    arrivals.append(products.Product("MacBook Air M2", price=1450, quantity=100))
+    assert 'bestbuy_stock_quantity{store="main",product="Google Pixel 7"} 3' in metrics.render()
+    assert 'product="MacBook Air M2"} 100' in metrics.render()
+
+def test_ended_threads_are_folded_into_totals(recording):
+    """Test counters of finished threads are kept in the totals but not per thread."""
+    before = len(metrics._all_counters)
+    product = products.Product("Google Pixel 7", price=500, quantity=100)
+    for _ in range(20):
+        thread = threading.Thread(target=product.buy, args=(1,))
+        thread.start()
+        thread.join()
+    assert len(metrics._all_counters) == before
+    assert 'bestbuy_revenue_cents_total{promotion="none"} 1000000' in metrics.render()
+
+def test_http_exporter(recording):
+    """Test the exporter serves the exposition text on /metrics."""
+    server = metrics.serve(port=0)
+    try:
+        host, port = server.server_address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert b"# TYPE bestbuy_orders_total counter" in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,37 @@
+import pytest
+from decimal import Decimal
+from money import Money
+
+def test_conversion_and_exact_sums():
+    """Test amounts convert exactly and sums do not drift like floats."""
+    assert Money.of(19.99).cents == 1999
+    assert Money.of("0.10") * 3 == Money.of("0.30")
+    assert sum([Money.of(0.1)] * 10) == 1
+    assert Money.of(Decimal("2.675")).cents == 268 # Half up, unlike round(2.675, 2)
+
+def test_comparison_hash_and_format():
+    """Test Money compares, hashes and formats like the number it represents."""
+    assert Money.of(1450) == 1450 and hash(Money.of(1450)) == hash(1450)
+    assert Money.of("12.50") == 12.5 and hash(Money.of("12.50")) == hash(12.5)
+    assert hash(Money(-199)) == hash(Decimal("-1.99")) and len({Money(-100), -1, -1.0}) == 1
+    assert Money.of("0.10") != 0.1 # 0.1 is not exactly representable, as with Decimal
+    assert Money.of(19.99) != 19.99 and Money.of(19.99) == Money.of("19.99") # Compare prices as Money
+    assert Money.of(5) < 6 and Money.of(5) > 4.99
+    assert f"{Money.of(3.5):.2f}" == "3.50" and str(Money.of(3)) == "3.00"
+
+def test_scale_rounds_half_up():
+    """Test scale rounds half up, symmetric around zero."""
+    assert Money(5).scale(1, 2) == Money(3)
+    assert Money(-5).scale(1, 2) == Money(-3)
+
+def test_fractional_factors_round_once():
+    """Test multiplying by a float, Decimal or Fraction takes the factor exactly and rounds half up once."""
+    from fractions import Fraction
+    assert Money.of("19.99") * 3 * 0.9 == Money.of("53.97")
+    assert 0.5 * Money(5) == Money(3)
+    assert Money(1000) * Decimal("0.333") == Money(333)
+    assert Money(100) * Fraction(1, 3) == Money(33)
+    with pytest.raises(ValueError):
+        Money(5) * float("inf")
+    with pytest.raises(TypeError):
+        Money(5) * "2"
@@ -93,3 +93,31 @@ def test_set_quantity_updates_status():
     with pytest.raises(ValueError, match="Quantity cannot be negative."):
         product.quantity = -1
 
+
+def test_products_have_no_instance_dict():
+    """Test the product classes are slotted and reject unknown attributes."""
+    for product in [products.Product("Test", price=5, quantity=10),
+                    products.NonStockedProduct("Test", price=5),
+                    products.LimitedProduct("Test", price=5, quantity=10, maximum=1)]:
+        assert not hasattr(product, "__dict__")
+        with pytest.raises(AttributeError):
+            product.colour = "red"
+
+
+def test_purchase_errors_are_typed():
+    """Test buy() raises structured errors with the usual messages, and they survive pickling."""
+    import pickle
+    product = products.Product("Test", price=5, quantity=3)
+    with pytest.raises(products.OutOfStock, match="Not enough stock") as raised:
+        product.buy(4)
+    assert (raised.value.product_name, raised.value.requested, raised.value.available) == ("Test", 4, 3)
+    assert str(pickle.loads(pickle.dumps(raised.value))) == str(raised.value)
+
+    limited = products.LimitedProduct("Shipping", price=10, quantity=5, maximum=1)
+    with pytest.raises(products.PurchaseLimitExceeded, match="Maximum allowed is 1") as raised:
+        limited.buy(2)
+    assert raised.value.maximum == 1
+
+    product.quantity = 0
+    with pytest.raises(products.InactiveProduct, match="product is inactive"):
+        product.buy(1)
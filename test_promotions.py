@@ -0,0 +1,104 @@
+import pytest
+import products
+import promotions
+from money import Money
+
+PROMOTIONS = [promotions.PercentDiscount("30% off!", percent=30),
+              promotions.SecondHalfPrice("Second Half price!"),
+              promotions.ThirdOneFree("Third One Free!")]
+
+@pytest.mark.parametrize("promotion", PROMOTIONS, ids=lambda promotion: promotion.name)
+def test_batch_matches_single_pricing(promotion):
+    """Test apply_promotion_batch gives the same totals in cents as apply_promotion."""
+    prices = [145000, 25000, 999, 333, 0]
+    quantities = [1, 2, 7, 3, 3]
+    expected = [promotion.apply_promotion(products.Product("Test", Money(price), 1), quantity).cents
+                for price, quantity in zip(prices, quantities)]
+    assert list(promotion.apply_promotion_batch(prices, quantities)) == expected
+
+def test_batch_falls_back_for_custom_promotions():
+    """Test a promotion without its own batch version is priced pair by pair."""
+    class FlatFee(promotions.Promotion):
+        def apply_promotion(self, product, quantity):
+            return product.price * quantity + 5
+
+    totals = FlatFee("Flat fee").apply_promotion_batch([1000, 2000], [1, 3])
+    assert list(totals) == [1500, 6500]
+    with pytest.raises(ValueError, match="same length"):
+        FlatFee("Flat fee").apply_promotion_batch([10], [1, 2])
+
+def test_custom_promotion_returning_fractional_price():
+    """Test a custom promotion that multiplies the price by a float still prices purchases."""
+    class TenPercentOff(promotions.Promotion):
+        def apply_promotion(self, product, quantity):
+            return product.price * quantity * 0.9
+
+    product = products.Product("Test", price=19.99, quantity=10)
+    product.promotion = TenPercentOff("10% off")
+    assert product.buy(3) == Money.of("53.97")
+
+def test_quote_cache_reuses_and_invalidates():
+    """Test promoted prices are cached and dropped when price or promotion changes."""
+    class CountingDiscount(promotions.PercentDiscount):
+        calls = 0
+        def apply_promotion(self, product, quantity):
+            CountingDiscount.calls += 1
+            return super().apply_promotion(product, quantity)
+
+    promotion = CountingDiscount("10% off!", percent=10)
+    product = products.Product("Test", price=100, quantity=10)
+    product.promotion = promotion
+    assert product.quote(2) == product.quote(2) == 180
+    assert CountingDiscount.calls == 1
+
+    product.price = 100 # Setting the price drops the promotion's cached entries
+    assert product.quote(2) == 180
+    assert CountingDiscount.calls == 2
+    assert product.quantity == 10
+
+def test_promotion_changed_in_place_reprices():
+    """Test changing a promotion's settings drops its cached prices at once."""
+    discount = promotions.PercentDiscount("Sale", percent=10)
+    product = products.Product("Test", price=10, quantity=10)
+    product.promotion = discount
+    assert product.quote(1) == Money.of("9.00")
+    discount.percent = 50
+    assert product.quote(1) == Money.of("5.00")
+    assert product.buy(1) == Money.of("5.00")
+
+    class FlatOff(promotions.Promotion):
+        """A custom promotion with its own setting, using the invalidate hook."""
+        def __init__(self, name, cents):
+            super().__init__(name)
+            self.cents = cents
+        def apply_promotion(self, product, quantity):
+            return product.price * quantity - Money(self.cents)
+
+    flat = FlatOff("Flat", 100)
+    product.promotion = flat
+    assert product.quote(1) == Money.of("9.00")
+    flat.cents = 300
+    flat.invalidate()
+    assert product.quote(1) == Money.of("7.00")
+
+def test_invalidation_during_pricing_is_not_cached_over():
+    """Test a price computed while its promotion changed is not kept in the cache."""
+    class RacedDiscount(promotions.PercentDiscount):
+        """Changes its percentage mid-computation, as another thread could."""
+        def apply_promotion(self, product, quantity):
+            total = super().apply_promotion(product, quantity)
+            if self.percent == 10:
+                self.percent = 50
+            return total
+
+    product = products.Product("Test", price=10, quantity=10)
+    product.promotion = RacedDiscount("Sale", percent=10)
+    assert product.quote(1) == Money.of("9.00") # Priced before the change
+    assert product.quote(1) == Money.of("5.00")
+
+def test_promotions_price_in_exact_cents():
+    """Test promotions round once, half up, to a whole cent."""
+    product = products.Product("Test", price=19.99, quantity=10)
+    assert promotions.PercentDiscount("30% off!", percent=30).apply_promotion(product, 3) == Money.of("41.98")
+    assert promotions.SecondHalfPrice("Second Half price!").apply_promotion(product, 3) == Money.of("49.98")
+    assert promotions.ThirdOneFree("Third One Free!").apply_promotion(product, 3) == Money.of("39.98")
@@ -0,0 +1,101 @@
+import pytest
+import products
+import reservations
+import store
+
+class FakeClock:
+    """A clock the tests move by hand."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_store():
+    macbook = products.Product("MacBook Air M2", price=1450, quantity=10)
+    shipping = products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1)
+    best_buy = store.Store([macbook, shipping])
+    clock = best_buy.reservations.clock = FakeClock()
+    return best_buy, macbook, shipping, clock
+
+def test_reserved_stock_is_held_until_ordered():
+    """Test a reservation withdraws stock, blocks other buyers and is consumed by order()."""
+    best_buy, macbook, shipping, clock = make_store()
+    cart = best_buy.reserve([(macbook, 4)], ttl=60)
+    cart = best_buy.reserve([(shipping, 1)], ttl=60, reservation=cart) # Adding to the cart
+    assert macbook.quantity == 6 and cart.held
+
+    with pytest.raises(Exception, match="Not enough stock"):
+        best_buy.order([(macbook, 7)])
+    macbook.price = 1000 # Reserved lines are priced when ordered
+    assert best_buy.order(cart) == 4000 + 10
+    assert cart.state == reservations.ORDERED and macbook.quantity == 6
+    with pytest.raises(reservations.ReservationError):
+        best_buy.order(cart)
+    best_buy.release(cart) # Too late, nothing changes
+    assert macbook.quantity == 6
+
+def test_reservations_expire_and_release():
+    """Test expired and released reservations give their stock back, in expiry order."""
+    best_buy, macbook, _, clock = make_store()
+    first = best_buy.reserve([(macbook, 3)], ttl=10)
+    second = best_buy.reserve([(macbook, 3)], ttl=30)
+    third = best_buy.reserve([(macbook, 3)], ttl=20)
+    assert macbook.quantity == 1
+
+    best_buy.release(third)
+    assert macbook.quantity == 4
+    clock.now = 15
+    best_buy.reserve([(macbook, 1)], ttl=1, reservation=second) # Renewed until 16
+    assert first.state == reservations.EXPIRED and macbook.quantity == 4 + 3 - 1
+
+    clock.now = 16
+    result = best_buy.order(second, raise_errors=False)
+    assert not result.ok and isinstance(result.error, reservations.ReservationError)
+    assert second.state == reservations.EXPIRED and macbook.quantity == 10
+    clock.now = 31 # Stale entries of the released and the renewed reservation are dropped unused
+    assert best_buy.expire_reservations() == 0
+    assert len(best_buy.reservations) == 0 and macbook.quantity == 10
+
+def test_log_keeps_reserved_stock(tmp_path):
+    """Test a crash gives held stock back, while ordered reservations stay sold."""
+    import wal
+    path = str(tmp_path / "inventory.wal")
+    best_buy = wal.open_store(path, [products.Product("MacBook Air M2", price=1450, quantity=10)])
+    macbook = best_buy.get_product("MacBook Air M2")
+
+    def recovered_quantity():
+        recovered = store.Store([])
+        wal.replay(path, recovered) # The log is not closed, as after a crash
+        return recovered.get_product("MacBook Air M2").quantity
+
+    cart = best_buy.reserve([(macbook, 4)], ttl=60)
+    assert macbook.quantity == 6 and recovered_quantity() == 10
+    best_buy.order(cart)
+    assert recovered_quantity() == 6
+    other = best_buy.reserve([(macbook, 2)], ttl=60)
+    best_buy.log.checkpoint(best_buy)
+    assert recovered_quantity() == 6
+    best_buy.release(other)
+    assert macbook.quantity == 6 and recovered_quantity() == 6
+    best_buy.log.close()
+
+def test_lines_added_while_ordering_are_not_sold_unpaid():
+    """Test a reserve() into a reservation that is being ordered is refused and its stock returned."""
+    import promotions
+    best_buy, macbook, shipping, clock = make_store()
+    refused = []
+
+    class AddsToCart(promotions.Promotion):
+        """Adds to the cart while the cart is being priced, as a concurrent request could."""
+        def apply_promotion(self, product, quantity):
+            try:
+                best_buy.reserve([(shipping, 1)], ttl=60, reservation=cart)
+            except reservations.ReservationError as e:
+                refused.append(e)
+            return product.price * quantity
+
+    macbook.promotion = AddsToCart("Adds to cart")
+    cart = best_buy.reserve([(macbook, 2)], ttl=60)
+    assert best_buy.order(cart) == 2900
+    assert refused and shipping.quantity == 250 and len(cart.lines) == 1
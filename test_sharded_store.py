@@ -0,0 +1,59 @@
+import pytest
+import products
+import promotions
+import sharded_store
+
+def make_products():
+    """Builds a catalog whose products spread over two shards."""
+    macbook = products.Product("MacBook Air M2", price=1450, quantity=100)
+    macbook.promotion = promotions.SecondHalfPrice("Second Half price!")
+    return [macbook,
+            products.Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+            products.Product("Google Pixel 7", price=500, quantity=250),
+            products.NonStockedProduct("Windows License", price=125),
+            products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1)]
+
+def test_orders_across_shards_are_atomic():
+    """Test single- and multi-shard orders, and that a failed multi-shard order changes nothing."""
+    product_list = make_products()
+    owners = {sharded_store.shard_of(product.name, 2) for product in product_list}
+    assert owners == {0, 1} # The test needs products on both shards
+
+    with sharded_store.ShardedStore(product_list, shards=2) as best_buy:
+        assert len(best_buy) == 5 and "Shipping" in best_buy
+        assert best_buy.get_total_quantity() == 1100
+        assert best_buy.order([(product_list[0], 2)]) == 1450 + 725
+        total = best_buy.order([("Google Pixel 7", 1), ("Windows License", 1), ("Shipping", 1),
+                                ("Bose QuietComfort Earbuds", 3)])
+        assert total == 500 + 125 + 10 + 750
+        assert best_buy.get_total_quantity() == 1100 - 2 - 1 - 1 - 3
+
+        before = best_buy.get_total_quantity()
+        with pytest.raises(Exception, match="Not enough stock"):
+            best_buy.order([("Shipping", 1), ("Google Pixel 7", 1), ("MacBook Air M2", 1000)])
+        with pytest.raises(Exception, match="Maximum allowed"):
+            best_buy.order([("Google Pixel 7", 1), ("Shipping", 2)])
+        assert best_buy.get_total_quantity() == before
+        assert best_buy.get_product("MacBook Air M2").quantity == 98
+
+def test_failed_send_leaves_shards_in_step():
+    """Test bad lines are refused before sending and a failed send does not misalign replies."""
+    with sharded_store.ShardedStore(make_products(), shards=2) as best_buy:
+        with pytest.raises(ValueError, match="positive integer"):
+            best_buy.order([("MacBook Air M2", 1), ("Google Pixel 7", lambda: 1)])
+        with pytest.raises(Exception):
+            best_buy._call_many({0: ("count", ()), 1: ("count", (lambda: 1,))})
+        assert len(best_buy) == 5 and best_buy.get_total_quantity() == 1100
+        assert best_buy.get_product("MacBook Air M2").quantity == 100
+
+def test_order_many():
+    """Test batched orders report each outcome without raising."""
+    with sharded_store.ShardedStore(make_products(), shards=2) as best_buy:
+        results = best_buy.order_many([[("Google Pixel 7", 200)],
+                                       [("Google Pixel 7", 100)],
+                                       [("Google Pixel 7", 50), ("MacBook Air M2", 1)],
+                                       [("Unknown", 1)]])
+        assert [result.ok for result in results] == [True, False, True, False]
+        assert results[2].total == 500 * 50 + 1450
+        assert "not in this store" in str(results[3].error)
+        assert best_buy.get_product("Google Pixel 7").quantity == 0
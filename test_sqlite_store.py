@@ -0,0 +1,69 @@
+import pytest
+import products
+import promotions
+import sqlite_store
+
+def make_store(path=":memory:"):
+    """Builds a small SQLite-backed store."""
+    macbook = products.Product("MacBook Air M2", price=1450, quantity=100)
+    macbook.promotion = promotions.SecondHalfPrice("Second Half price!")
+    product_list = [macbook,
+                    products.NonStockedProduct("Windows License", price=125),
+                    products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1)]
+    best_buy = sqlite_store.SQLiteStore(path)
+    best_buy.add_products(product_list)
+    return best_buy, product_list
+
+def test_store_api_on_sqlite():
+    """Test the Store API works on the database and keeps objects in sync."""
+    best_buy, (macbook, windows, shipping) = make_store()
+    assert macbook in best_buy and len(best_buy) == 3
+    assert best_buy.get_all_products() == (macbook, windows, shipping)
+    assert best_buy.order([(macbook, 2), (windows, 1)]) == 1450 + 725 + 125
+    assert macbook.quantity == 98
+    assert best_buy.get_total_quantity() == 98 + 250
+
+    with pytest.raises(Exception, match="Not enough stock"):
+        best_buy.order([(macbook, 1), (shipping, 1), (macbook, 98)])
+    assert best_buy.get_total_quantity() == 98 + 250
+
+    shipping.buy(1) # Direct purchases are written through
+    best_buy.remove_product(windows)
+    assert windows not in best_buy
+    assert best_buy.get_total_quantity() == 98 + 249
+
+def test_reopen_materializes_products(tmp_path):
+    """Test a reopened database rebuilds products, limits and promotions."""
+    path = str(tmp_path / "store.db")
+    best_buy, (macbook, _, _) = make_store(path)
+    best_buy.order([(macbook, 10)])
+    best_buy.close()
+
+    reopened = sqlite_store.SQLiteStore(path)
+    macbook = reopened.get_product("MacBook Air M2")
+    assert macbook.quantity == 90 and macbook.promotion.name == "Second Half price!"
+    assert reopened.get_product("Shipping").maximum == 1
+    assert reopened.get_all_products()[0] is macbook
+    assert reopened.order([(macbook, 2)]) == 1450 + 725
+    reopened.close()
+
+def test_direct_buy_during_order_sync_is_written():
+    """Test a product outside the order is written through while the order's objects are synced."""
+    best_buy, (macbook, _, shipping) = make_store()
+
+    class Chained(products.Product):
+        """Buys another product whenever its own quantity is set, as a concurrent buyer would."""
+        __slots__ = ()
+        @products.Product.quantity.setter
+        def quantity(self, value):
+            products.Product.quantity.fset(self, value)
+            if pending:
+                pending.pop().buy(1)
+
+    pending = []
+    pixel = Chained("Google Pixel 7", price=500, quantity=10)
+    best_buy.add_product(pixel)
+    pending.append(shipping)
+    best_buy.order([(pixel, 2)])
+    assert shipping.quantity == 249 and pixel.quantity == 8
+    assert best_buy.get_total_quantity() == 100 + 249 + 8
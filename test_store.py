@@ -0,0 +1,233 @@
+import pytest
+import instrumentation
+import products
+import promotions
+import store
+
+def make_store():
+    """Builds a small store used by most tests."""
+    product_list = [products.Product("MacBook Air M2", price=1450, quantity=100),
+                    products.Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+                    products.NonStockedProduct("Windows License", price=125),
+                    products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1)]
+    return store.Store(product_list), product_list
+
+def test_membership_and_name_lookup():
+    """Test 'in', get_product and remove_product use the index."""
+    best_buy, product_list = make_store()
+    macbook = product_list[0]
+    assert macbook in best_buy
+    assert best_buy.get_product("MacBook Air M2") is macbook
+
+    best_buy.remove_product(macbook)
+    assert macbook not in best_buy
+    assert best_buy.get_product("MacBook Air M2") is None
+    with pytest.raises(ValueError, match="not found"):
+        best_buy.remove_product(macbook)
+
+def test_get_all_products_keeps_insertion_order():
+    """Test active products are returned in the order they were added."""
+    best_buy, product_list = make_store()
+    product_list[1].quantity = 0
+    assert list(best_buy.get_all_products()) == [product_list[0], product_list[2], product_list[3]]
+
+def test_total_quantity_tracks_changes():
+    """Test the running total follows buy, quantity setter, add and remove."""
+    best_buy, product_list = make_store()
+    assert best_buy.get_total_quantity() == 850
+    product_list[0].buy(10)
+    product_list[1].quantity = 100
+    product_list[2].buy(5) # Non-stocked, no effect
+    assert best_buy.get_total_quantity() == 440
+
+    extra = products.Product("Google Pixel 7", price=500, quantity=250)
+    best_buy.add_product(extra)
+    best_buy.remove_product(product_list[3])
+    assert best_buy.get_total_quantity() == 440 + 250 - 250
+    # A removed product no longer affects the store
+    product_list[3].quantity = 0
+    assert best_buy.get_total_quantity() == 440
+
+def test_get_all_products_follows_activation_changes():
+    """Test the active view is refreshed when a product sells out or is restocked."""
+    best_buy, product_list = make_store()
+    before = best_buy.get_all_products()
+    assert best_buy.get_all_products() is before # Cached while nothing flips
+    product_list[3].quantity = 0
+    assert product_list[3] not in best_buy.get_all_products()
+    product_list[3].quantity = 5
+    product_list[0].quantity = 0
+    assert list(best_buy.get_all_products()) == [product_list[1], product_list[2], product_list[3]]
+
+def test_failed_order_leaves_stock_untouched():
+    """Test an order with one bad line does not change any quantity."""
+    best_buy, product_list = make_store()
+    macbook, bose, _, shipping = product_list
+    with pytest.raises(Exception, match="Not enough stock"):
+        best_buy.order([(macbook, 5), (bose, 501)])
+    with pytest.raises(Exception, match="Maximum allowed"):
+        best_buy.order([(macbook, 5), (shipping, 2)])
+    # Two lines for the same product are checked against the combined amount
+    with pytest.raises(Exception, match="Not enough stock"):
+        best_buy.order([(macbook, 60), (macbook, 60)])
+    assert macbook.quantity == 100
+    assert best_buy.get_total_quantity() == 850
+
+def test_order_rolls_back_when_buy_fails():
+    """Test quantities are restored if a purchase fails during the commit phase."""
+    class FailingProduct(products.Product):
+        def buy(self, quantity):
+            raise Exception("payment declined")
+
+    best_buy, product_list = make_store()
+    failing = FailingProduct("Broken", price=1, quantity=10)
+    best_buy.add_product(failing)
+    with pytest.raises(Exception, match="Order failed for 'Broken': payment declined"):
+        best_buy.order([(product_list[0], 5), (failing, 1)])
+    assert product_list[0].quantity == 100
+
+def test_concurrent_orders_do_not_oversell():
+    """Test threads ordering the same products never sell more than the stock."""
+    import threading
+    first = products.Product("First", price=1, quantity=100)
+    second = products.Product("Second", price=1, quantity=100)
+    best_buy = store.Store([first, second], thread_safe=True)
+    sold = []
+
+    def worker(shopping_list):
+        for _ in range(100):
+            try:
+                best_buy.order(shopping_list)
+                sold.append(1)
+            except Exception:
+                pass
+
+    # Opposite line order in each thread would deadlock without ordered locking
+    threads = [threading.Thread(target=worker, args=([(first, 1), (second, 1)],)),
+               threading.Thread(target=worker, args=([(second, 1), (first, 1)],))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(sold) == 100
+    assert first.quantity == second.quantity == 0
+    assert best_buy.get_total_quantity() == 0
+
+def test_order_batch_allocates_stock_in_order():
+    """Test a batch fills orders until stock runs out and reports the rest."""
+    best_buy, product_list = make_store()
+    macbook, _, windows, shipping = product_list
+    macbook.quantity = 3
+    results = best_buy.order_batch([[(macbook, 2), (windows, 1)],
+                                    [(macbook, 2)], # Only 1 left
+                                    [(macbook, 1), (shipping, 2)], # Over the limit
+                                    [(macbook, 1)],
+                                    "not a list"])
+
+    assert [result.ok for result in results] == [True, False, False, True, False]
+    assert results[0].total == 2 * 1450 + 125
+    assert "Not enough stock" in str(results[1].error)
+    assert "Maximum allowed" in str(results[2].error)
+    assert isinstance(results[4].error, TypeError)
+    assert macbook.quantity == 0
+    assert shipping.quantity == 250
+    assert macbook not in best_buy.get_all_products()
+
+def test_quote_does_not_change_stock():
+    """Test Store.quote prices an order like order() but leaves stock alone."""
+    best_buy, product_list = make_store()
+    macbook, _, windows, shipping = product_list
+    macbook.promotion = promotions.SecondHalfPrice("Second Half price!")
+    shopping_list = [(macbook, 2), (windows, 1)]
+    assert best_buy.quote(shopping_list) == 1450 + 725 + 125
+    assert best_buy.get_total_quantity() == 850
+    assert best_buy.order(shopping_list) == 1450 + 725 + 125
+    with pytest.raises(Exception, match="Maximum allowed"):
+        best_buy.quote([(shipping, 2)])
+
+def test_add_and_merge_deduplicate():
+    """Test '+' and merge keep shared products once and reconcile SKUs by name."""
+    best_buy, product_list = make_store()
+    macbook = product_list[0]
+    other_macbook = products.Product("MacBook Air M2", price=1450, quantity=20)
+    pixel = products.Product("Google Pixel 7", price=500, quantity=250)
+    other = store.Store([macbook, other_macbook, pixel])
+
+    combined = best_buy + other
+    assert len(combined) == 6 # macbook counted once, other_macbook kept as a separate object
+    assert combined.get_total_quantity() == 850 + 20 + 250
+
+    by_sku = store.Store.merge(best_buy, other, store.Store([]), key="name")
+    assert len(by_sku) == 5
+    merged_macbook = by_sku.get_product("MacBook Air M2")
+    assert merged_macbook is not macbook and merged_macbook.quantity == 120
+    assert by_sku.get_product("Google Pixel 7") is pixel # Not duplicated, so shared
+    assert store.Store.merge(best_buy, other, key="name", stock="max").get_product("MacBook Air M2").quantity == 100
+
+def test_order_instrumentation():
+    """Test enabled instrumentation records every stage of an order, and nothing when disabled."""
+    best_buy, product_list = make_store()
+    instrumentation.registry.reset()
+    best_buy.order([(product_list[0], 1)])
+    assert instrumentation.registry.snapshot() == {}
+
+    with instrumentation.enabled() as registry:
+        best_buy.order([(product_list[0], 2), (product_list[1], 1)])
+    stages = registry.snapshot()
+    assert set(stages) == set(instrumentation.STAGES)
+    assert stages["validation"]["calls"] == 1 + 2 # The order, then each line's buy()
+    assert stages["decrement"]["calls"] == 2
+    assert not instrumentation.ENABLED
+    registry.reset()
+
+def test_non_raising_order_reports_every_failing_line():
+    """Test raise_errors=False returns an OrderResult listing each rejected line."""
+    best_buy, product_list = make_store()
+    macbook, bose, _, shipping = product_list
+    bose.quantity = 0
+    result = best_buy.order([(macbook, 1), (bose, 1), (macbook, 100), (shipping, 2), ("junk", 1)],
+                            raise_errors=False)
+    assert not result.ok and result.total == 0
+    # Stock problems are reported on the product's first line
+    assert [(failure.line, failure.product) for failure in result.failures] == \
+        [(0, macbook), (1, bose), (3, shipping), (4, None)]
+    assert [type(failure.error.cause) for failure in result.failures[:3]] == \
+        [products.OutOfStock, products.InactiveProduct, products.PurchaseLimitExceeded]
+    assert isinstance(result.failures[3].error, TypeError)
+    assert result.error is result.failures[0].error
+    assert macbook.quantity == 100 # Nothing was bought
+
+    result = best_buy.order([(macbook, 2)], raise_errors=False)
+    assert result.ok and result.total == 2900 and result.failures == ()
+    with pytest.raises(store.OrderError, match="Order failed for 'MacBook Air M2': Not enough stock"):
+        best_buy.order([(macbook, 600)])
+
+def test_trusted_order_matches_checked_order():
+    """Test trusted=True prices and decrements like order(), and reports failures without raising."""
+    best_buy, product_list = make_store()
+    macbook, bose, windows, shipping = product_list
+    bose.promotion = promotions.ThirdOneFree("Third One Free!")
+    shopping_list = [(macbook, 2), (bose, 3), (windows, 1), (bose, 3), (shipping, 1)]
+    expected = best_buy.quote(shopping_list)
+
+    result = best_buy.order(shopping_list, trusted=True)
+    assert result.ok and result.total == expected
+    assert (macbook.quantity, bose.quantity, shipping.quantity) == (98, 494, 249)
+    assert best_buy.get_total_quantity() == 98 + 494 + 249
+
+    result = best_buy.order([(shipping, 2), (macbook, 99)], trusted=True)
+    assert [type(failure.error.cause) for failure in result.failures] == \
+        [products.PurchaseLimitExceeded, products.OutOfStock]
+    assert macbook.quantity == 98
+
+def test_remove_renamed_product():
+    """Test a product renamed after it was added is removed cleanly."""
+    best_buy, product_list = make_store()
+    macbook = product_list[0]
+    macbook.name = "MacBook Air M3"
+    best_buy.remove_product(macbook)
+    assert macbook not in best_buy and macbook._stores == ()
+    assert best_buy.get_product("MacBook Air M2") is None
+    assert best_buy.get_total_quantity() == 500 + 250
+    with pytest.raises(ValueError, match="not found"):
+        best_buy.remove_product(macbook)
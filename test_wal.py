@@ -0,0 +1,88 @@
+import products
+import promotions
+import wal
+
+def make_products():
+    """Builds the products the log is seeded with."""
+    macbook = products.Product("MacBook Air M2", price=1450, quantity=100)
+    macbook.promotion = promotions.SecondHalfPrice("Second Half price!")
+    return [macbook,
+            products.NonStockedProduct("Windows License", price=125),
+            products.LimitedProduct("Shipping", price=10, quantity=250, maximum=1)]
+
+def test_replay_restores_orders_and_removals(tmp_path):
+    """Test a store reopened from its log sees every committed mutation."""
+    path = str(tmp_path / "inventory.wal")
+    best_buy = wal.open_store(path, make_products(), batch_size=1000, flush_interval=60)
+    macbook, windows, shipping = best_buy.get_all_products()
+    best_buy.order([(macbook, 3), (windows, 2), (shipping, 1)])
+    best_buy.remove_product(windows)
+    best_buy.log.close() # Commits the pending group
+
+    reopened = wal.open_store(path, make_products())
+    assert [product.name for product in reopened.get_all_products()] == ["MacBook Air M2", "Shipping"]
+    assert reopened.get_product("MacBook Air M2").quantity == 97
+    assert reopened.get_product("MacBook Air M2").promotion.name == "Second Half price!"
+    assert reopened.get_total_quantity() == 97 + 249
+    reopened.log.close()
+
+def test_group_commit_and_torn_tail(tmp_path):
+    """Test records are only written in groups and a torn last line is skipped on replay."""
+    path = str(tmp_path / "inventory.wal")
+    log = wal.WriteAheadLog(path, batch_size=2, flush_interval=60)
+    product = products.Product("Google Pixel 7", price=500, quantity=250)
+    log.log_add(product)
+    assert open(path).read() == "" # Still buffered
+    product.quantity = 200
+    log.log_quantity(product) # Second record fills the group
+    log.close()
+    with open(path, "a") as log_file:
+        log_file.write('{"op":"set","na') # Crash in mid-write
+
+    best_buy = wal.open_store(path)
+    assert best_buy.get_product("Google Pixel 7").quantity == 200
+    best_buy.get_product("Google Pixel 7").quantity = 150
+    best_buy.log.commit()
+    assert open(path).read().endswith('{"op":"set","name":"Google Pixel 7","quantity":150}\n')
+    best_buy.log.checkpoint(best_buy)
+    assert len(open(path).readlines()) == 1
+    best_buy.log.close()
+
+def test_store_calls_wait_for_their_fsync(tmp_path):
+    """Test orders are on disk when they return, also when placed from several threads."""
+    import threading
+    path = str(tmp_path / "inventory.wal")
+    best_buy = wal.open_store(path, make_products(), thread_safe=True, batch_size=1000, flush_interval=60)
+    macbook = best_buy.get_product("MacBook Air M2")
+    best_buy.order([(macbook, 3)])
+    assert open(path).read().endswith('{"op":"set","name":"MacBook Air M2","quantity":97}\n')
+
+    threads = [threading.Thread(target=best_buy.order, args=([(macbook, 1)],)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recovered = wal.store.Store([])
+    wal.replay(path, recovered) # Without closing the log first, as after a crash
+    assert recovered.get_product("MacBook Air M2").quantity == 89
+    best_buy.log.close()
+
+def test_checkpoint_drops_records_appended_while_writing(tmp_path, monkeypatch):
+    """Test a record appended during the checkpoint's last group write is not replayed twice."""
+    path = str(tmp_path / "inventory.wal")
+    best_buy = wal.open_store(path, make_products(), thread_safe=True, batch_size=1000, flush_interval=60)
+    macbook = best_buy.get_product("MacBook Air M2")
+    macbook.quantity = 90 # Leaves a group for the checkpoint to write
+    fsync = wal.os.fsync
+    def fsync_and_append(descriptor):
+        monkeypatch.setattr(wal.os, "fsync", fsync)
+        best_buy.log.log_add(macbook) # As if another thread got in while the lock was released
+        fsync(descriptor)
+    monkeypatch.setattr(wal.os, "fsync", fsync_and_append)
+    best_buy.log.checkpoint(best_buy)
+    best_buy.log.close()
+
+    reopened = wal.open_store(path)
+    assert len(reopened) == 3
+    assert reopened.get_product("MacBook Air M2").quantity == 90
+    reopened.log.close()
@@ -0,0 +1,269 @@
+# wal.py
+import json
+import os
+import threading
+import time
+import products
+import store
+from typing import Any, Dict, List, Optional
+
+class WriteAheadLog:
+    """
+    Append-only log of inventory mutations with group commit.
+
+    Records are JSON lines:
+        {"op": "add", "product": {...}}         Store.add_product
+        {"op": "remove", "name": ...}           Store.remove_product
+        {"op": "set", "name": ..., "quantity": n}  any quantity change
+
+    "set" records carry the new quantity rather than a delta, so replaying
+    a record twice is harmless. Appends only go to an in-memory buffer;
+    the buffer is written and fsynced as one group once batch_size records
+    are pending, flush_interval seconds after the first pending record
+    (checked by a background thread), when commit() is called, or when a
+    caller waits for its records with wait_durable(). Store calls that
+    mutate (order, add_product, ...) wait before returning, so what they
+    did survives a crash. Callers that wait while a group is being
+    fsynced share the next fsync, which is what makes it a group commit.
+    Records nobody waited for (e.g. a direct Product.buy) can still be lost
+    with the last, unsynced group.
+
+    Products are identified by name when replaying; with duplicate names
+    the first product added under that name is used. Stock held by
+    Store.reserve is logged as stock (reservations end with the process),
+    and an order of a reservation is logged when it is placed.
+    """
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.05):
+        """Opens (or creates) the log at path for appending."""
+        if batch_size <= 0 or flush_interval <= 0:
+            raise ValueError("batch_size and flush_interval must be positive.")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        _truncate_torn_tail(path)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending: List[str] = []
+        self._first_pending_at = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # Records are numbered from 1 as they are appended; _durable is the last one fsynced
+        self._appended = 0
+        self._durable = 0
+        self._synced = threading.Condition(self._lock)
+        # True while one thread writes a group with the lock released
+        self._writing = False
+        # Sequence number of the calling thread's last record
+        self._local = threading.local()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_periodically, name="wal-flusher", daemon=True)
+        self._flusher.start()
+
+    # --- Writing ---
+    def append(self, record: Dict[str, Any]):
+        """Queues a record; it becomes durable with the next group commit."""
+        line = json.dumps(record, separators=(',', ':'))
+        with self._lock:
+            if self._closed:
+                raise ValueError("Write-ahead log is closed.")
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+                self._wake.notify()
+            self._pending.append(line)
+            self._appended += 1
+            self._local.sequence = self._appended
+            if len(self._pending) >= self.batch_size:
+                self._write_pending()
+
+    def log_add(self, product: products.Product):
+        """Queues an "add" record for product."""
+        self.append({"op": "add", "product": product.to_dict()})
+
+    def log_remove(self, product: products.Product):
+        """Queues a "remove" record for product."""
+        self.append({"op": "remove", "name": product.name})
+
+    def log_quantity(self, product: products.Product, quantity: Optional[int] = None):
+        """Queues a "set" record with the given quantity (default: product's current one)."""
+        if quantity is None:
+            quantity = product.quantity
+        self.append({"op": "set", "name": product.name, "quantity": quantity})
+
+    def commit(self):
+        """Writes and fsyncs every pending record now."""
+        with self._lock:
+            self._write_pending()
+
+    def wait_durable(self):
+        """
+        Returns once every record the calling thread appended is fsynced.
+
+        If no group is being written, the caller writes the pending one
+        itself, together with whatever other threads appended meanwhile.
+        """
+        sequence = getattr(self._local, 'sequence', 0)
+        with self._lock:
+            while self._durable < sequence:
+                if self._writing:
+                    self._synced.wait()
+                else:
+                    self._write_pending()
+
+    def _write_pending(self):
+        """
+        Writes the pending group with one fsync. Caller holds the lock.
+
+        The lock is released during the write, so other threads can append
+        to the next group meanwhile; one group is written at a time.
+        """
+        while self._writing:
+            self._synced.wait()
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        last = self._appended
+        self._writing = True
+        self._lock.release()
+        try:
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except BaseException:
+            self._lock.acquire()
+            self._pending[:0] = lines # Put the group back for the next attempt
+            raise
+        else:
+            self._lock.acquire()
+            self._durable = last
+        finally:
+            self._writing = False
+            self._synced.notify_all()
+
+    def _flush_periodically(self):
+        """Background thread: commits each group flush_interval after its first record."""
+        with self._lock:
+            while not self._closed:
+                if not self._pending:
+                    self._wake.wait()
+                    continue
+                remaining = self._first_pending_at + self.flush_interval - time.monotonic()
+                if remaining > 0:
+                    self._wake.wait(remaining)
+                    continue
+                self._write_pending()
+
+    def close(self):
+        """Commits pending records and closes the log."""
+        with self._lock:
+            if self._closed:
+                return
+            self._write_pending()
+            self._closed = True
+            self._wake.notify()
+        self._flusher.join()
+        self._file.close()
+
+    def __enter__(self) -> 'WriteAheadLog':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Recovery ---
+    def checkpoint(self, store_instance: store.Store):
+        """
+        Replaces the log with one "add" record per product currently in the store.
+
+        Keeps replay time proportional to the catalog instead of the history.
+        The store's lock is held throughout, so no change to it is logged
+        while the snapshot is taken; records still pending once the last
+        group is written are covered by the snapshot and dropped.
+        """
+        with store_instance._lock, self._lock:
+            self._write_pending()
+            temporary_path = self.path + '.tmp'
+            with open(temporary_path, 'w', encoding='utf-8') as checkpoint_file:
+                for product in store_instance.iter_products():
+                    data = product.to_dict()
+                    if "quantity" in data: # Including the stock reservations hold
+                        data["quantity"] = store_instance._logged_quantity(product)
+                    checkpoint_file.write(json.dumps({"op": "add", "product": data},
+                                                     separators=(',', ':')) + '\n')
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+            self._file.close()
+            os.replace(temporary_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            # Appended while the last group was being written; replaying an "add" again would duplicate it
+            self._pending = []
+            self._durable = self._appended
+            self._synced.notify_all()
+
+def _truncate_torn_tail(path: str):
+    """Cuts off a partial last line left by a crash, so new records start on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r+b') as log_file:
+        size = log_file.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        # Scan back from the end for the last newline
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            log_file.seek(position - step)
+            chunk = log_file.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position != size:
+            log_file.truncate(position)
+
+def replay(path: str, store_instance: store.Store) -> int:
+    """
+    Applies the records of the log at path to a store; returns how many were applied.
+
+    The store should not have a log attached yet, or the replayed changes
+    would be logged again. A torn last line (crash in mid-write) is ignored.
+    """
+    if not os.path.exists(path):
+        return 0
+    applied = 0
+    with open(path, encoding='utf-8') as log_file:
+        for line in log_file:
+            if not line.endswith('\n'):
+                break # Torn final write; every complete group ends with a newline
+            record = json.loads(line)
+            op = record["op"]
+            if op == "add":
+                store_instance.add_product(products.from_dict(record["product"]))
+            else:
+                product = store_instance.get_product(record["name"])
+                if product is None:
+                    raise ValueError(f"Log refers to unknown product '{record['name']}'.")
+                if op == "set":
+                    product.quantity = record["quantity"]
+                elif op == "remove":
+                    store_instance.remove_product(product)
+                else:
+                    raise ValueError(f"Unknown log record: {op!r}")
+            applied += 1
+    return applied
+
+def open_store(path: str, initial_products: Optional[List[products.Product]] = None,
+               thread_safe: bool = False, **log_options) -> store.Store:
+    """
+    Rebuilds a store from the log at path and attaches the log to it.
+
+    initial_products seed a new (missing or empty) log. Returns the store;
+    its log is available as store.log.
+    """
+    store_instance = store.Store([], thread_safe=thread_safe)
+    replayed = replay(path, store_instance)
+    log = WriteAheadLog(path, **log_options)
+    store_instance.attach_log(log)
+    if not replayed:
+        for product in initial_products or []:
+            store_instance.add_product(product)
+    return store_instance